@@ -0,0 +1,86 @@
+"""
+比較 Flex 訊息兩種建構方式，各 bubble 類型的建構 + 序列化時間：
+
+    model: Template 以 pydantic 模型建構，再由 SDK 轉為 dict / JSON (原本的作法)
+    raw:   RawTemplate 直接建構 dict，送出前只做 JSON 序列化
+
+兩者產生的內容相同由 line_bot/tests.py 的 FlexParityTests 確認 (manage.py test)。
+
+    python -m benchmarks.bench_flex [--size 20] [--repeat 500]
+"""
+import argparse
+import json
+
+from benchmarks.common import measure, percentiles, seed_bank
+
+from linebot.v3.messaging import ApiClient, Configuration
+
+from line_bot.utils.postback import QuestionPostback
+from line_bot.utils.raw_template import RawTemplateBuilder
+from line_bot.utils.template_builder import TemplateBuilder
+from question_bank.database import QuestionBank, QuestionRandomizer, get_engine
+
+
+def bubble_cases(size: int):
+    category = QuestionBank.get_categorys()[0]
+    subject = QuestionBank.get_subject(category_id=1, subject_id=1)
+    deck = QuestionBank.get_deck(category_id=1, subject_id=1)
+
+    randomizer = QuestionRandomizer(deck.question_at(42, 0), 42)
+    randomizer.process_variables()
+    question = randomizer.question
+
+    reply_answer = "A*" * (size // 2) + "*" * (size % 2)
+    postback = QuestionPostback(None, QuestionPostback.initialize(flag=1, category_id=1))
+    test_postback = QuestionPostback(None, QuestionPostback.initialize(
+        flag=3, category_id=1, subject_id=1, question_seed=42,
+        mode=QuestionPostback.QuestionModeType.TEST, reply_answer=reply_answer[:1]))
+    review_postback = QuestionPostback(None, QuestionPostback.initialize(
+        flag=4, category_id=1, subject_id=1, question_seed=42, reply_answer=reply_answer))
+
+    return [
+        ("category", lambda template: template.category_bubble(category)),
+        ("subject", lambda template: template.subject_bubble(subject, postback)),
+        ("mode", lambda template: template.mode_bubble(subject, postback)),
+        ("question", lambda template: template.question_bubble(question, test_postback)),
+        ("result", lambda template: template.result_bubble(subject, review_postback)),
+        ("review", lambda template: template.review_bubble(question, 0, 2, 2, review_postback)),
+    ]
+
+
+def serialize(builder, build, api_client: ApiClient) -> str:
+    # 與 SDK 送出 reply 時相同：sanitize_for_serialization 後 json.dumps
+    reply_message = builder.ReplyMessageRequest(
+        reply_token="token",
+        messages=[
+            builder.FlexMessage(
+                alt_text="benchmark",
+                contents=builder.FlexCarousel(contents=[build(builder.template)])
+            )
+        ]
+    )
+    return json.dumps(api_client.sanitize_for_serialization(reply_message))
+
+
+def run(size, repeat):
+    seed_bank(get_engine(), (size,))
+    api_client = ApiClient(Configuration(access_token="token"))
+
+    print(f"{'bubble':<9} {'path':<6} {'p50 (us)':>10} {'p95 (us)':>10} {'bytes':>7}")
+    for name, build in bubble_cases(size):
+        for path, builder in (("model", TemplateBuilder), ("raw", RawTemplateBuilder)):
+            stats = percentiles(measure(lambda: serialize(builder, build, api_client), repeat))
+            length = len(serialize(builder, build, api_client).encode())
+            print(f"{name:<9} {path:<6} {stats['p50'] * 1e6:>10.1f} {stats['p95'] * 1e6:>10.1f} {length:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    run(args.size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
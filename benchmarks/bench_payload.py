@@ -0,0 +1,126 @@
+"""
+多事件 webhook 壓測：一個 webhook 內含 --users 位使用者、每人 --events 個 postback，
+比較 LineWebhookHandler 不同 concurrency (1 為原本的依序處理) 下整個 webhook 的處理時間。
+
+Messaging API 由本機替代伺服器回應，--latency 模擬每次 API 呼叫的往返時間；
+同一使用者的 reply 順序會一併檢查。
+
+    python -m benchmarks.bench_payload [--users 20] [--events 2] [--latency 0.05]
+                                       [--concurrency 1 4 8 16] [--repeat 10]
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import time
+
+# 執行緒池中的各執行緒需共用同一個資料庫，不能使用記憶體內 SQLite
+_database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["connectString"] = f"sqlite:///{_database.name}"
+
+from benchmarks.bench_postback import CHANNEL_SECRET, stub, views
+from benchmarks.common import percentiles, seed_bank
+
+from django.test import RequestFactory
+
+from line_bot.utils.postback import QuestionPostback
+from question_bank.database import get_engine
+
+
+def sign(body: str) -> str:
+    return base64.b64encode(hmac.new(CHANNEL_SECRET.encode(), body.encode(), hashlib.sha256).digest()).decode()
+
+
+def payload(users: int, events: int, sequence: int) -> str:
+    data = QuestionPostback.initialize(flag=2, category_id=1, subject_id=1)
+    return json.dumps({
+        "destination": "Ubot",
+        "events": [{
+            "type": "postback",
+            "mode": "active",
+            "timestamp": int(time.time() * 1000),
+            "source": {"type": "group", "groupId": "Cclassroom", "userId": f"Ustudent{user}"},
+            "webhookEventId": f"payload-{sequence}-{user}-{index}",
+            "deliveryContext": {"isRedelivery": False},
+            "replyToken": f"{user}:{index}",
+            "postback": {"data": data}
+        } for index in range(events) for user in range(users)]
+    })
+
+
+class ReplyOrder:
+    """記錄各使用者 reply 的順序 (reply token 為 使用者:序號)"""
+
+    def __init__(self):
+        self.replies = []
+        self._reply = views.builder.reply
+
+    def reply(self, line_bot_api, reply_token, messages):
+        self.replies.append(reply_token)
+        return self._reply(line_bot_api, reply_token, messages)
+
+    def check(self) -> None:
+        last = {}
+        for token in self.replies:
+            user, index = map(int, token.split(":"))
+            if index <= last.get(user, -1):
+                raise AssertionError(f"replies for user {user} out of order")
+            last[user] = index
+        self.replies.clear()
+
+
+def run(users, events, latency, concurrency_values, repeat):
+    seed_bank(get_engine(), (20,))
+    stub.latency = latency
+
+    order = ReplyOrder()
+    views.builder.reply = order.reply
+    factory = RequestFactory()
+
+    print(f"{users} users x {events} events, API latency {latency * 1e3:.0f} ms")
+    print(f"{'concurrency':>11} {'p50 (ms)':>9} {'p95 (ms)':>9} {'per event (ms)':>15}")
+    sequence = 0
+    for concurrency in concurrency_values:
+        views.handler.shutdown()
+        views.handler.concurrency = concurrency
+
+        samples = []
+        # 第一輪取得使用者資料並建立連線，不計時
+        for index in range(repeat + 1):
+            sequence += 1
+            body = payload(users, events, sequence)
+            request = factory.post("/line-bot/", data=body, content_type="application/json", HTTP_X_LINE_SIGNATURE=sign(body))
+
+            start = time.perf_counter()
+            response = views.callback(request)
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                raise RuntimeError(f"callback returned {response.status_code}")
+            order.check()
+            if index:
+                samples.append(elapsed)
+
+        stats = percentiles(samples)
+        print(f"{concurrency:>11} {stats['p50'] * 1e3:>9.1f} {stats['p95'] * 1e3:>9.1f} {stats['p50'] * 1e3 / (users * events):>15.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--events", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05, help="替代伺服器每次回應前的延遲 (秒)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        run(args.users, args.events, args.latency, args.concurrency, args.repeat)
+    finally:
+        os.unlink(_database.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+端對端 postback 壓測：以正確簽章的 webhook 內容呼叫 line_bot.views.callback，
+題庫使用記憶體內 SQLite，Messaging API 由本機替代伺服器 (benchmarks.line_stub) 回應。
+
+每個科目大小、每種 postback 各送出 --repeat 次，輸出：
+
+    total:     callback 整體耗時
+    parse:     簽章驗證 + webhook 解析
+    profile:   取得使用者資料
+    build:     TemplateBuilder 建立訊息 (含 query 與 randomize)
+    query:     QuestionBank 查詢 (含快取)
+    randomize: 題目變數運算
+    reply:     送出 reply 訊息
+
+並記錄每次請求的 SQL 數量與記憶體配置 (tracemalloc 另跑一輪，避免影響耗時)。
+結果存為 JSON，可用 --compare 與先前的結果比較 p50。
+
+    python -m benchmarks.bench_postback [--sizes 10 100 1000 10000] [--repeat 100] [--cold]
+                                        [--output benchmarks/results/postback.json] [--compare old.json]
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from benchmarks.common import percentiles, quiet_logging, seed_bank
+from benchmarks.line_stub import LineApiStub
+
+
+CHANNEL_SECRET = "benchmark-secret"
+
+# views 匯入時即讀取設定，需先啟動替代伺服器並設定環境變數
+stub = LineApiStub().start()
+os.environ["line_api_host"] = stub.url
+os.environ["secret"] = CHANNEL_SECRET
+os.environ["line_webhook_mode"] = "sync"
+# 壓測重複送出相同的 postback，不合併也不限速
+os.environ["line_rate_limit"] = "0"
+os.environ["line_coalesce_window"] = "0"
+os.environ.setdefault("channel_access_token", "benchmark-token")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "question_bank.settings")
+
+import django
+
+django.setup()
+
+quiet_logging()
+
+from django.test import RequestFactory
+from sqlalchemy import event
+
+from line_bot import views
+from line_bot.utils.postback import QuestionPostback
+from line_bot.utils.profile import profile_cache
+from line_bot.utils.template_builder import menu_cache, render_cache
+from question_bank.database import QuestionBank, QuestionRandomizer, get_engine
+
+
+STAGES = ("total", "parse", "profile", "build", "query", "randomize", "reply")
+
+
+class StageRecorder:
+    """包裝各階段的函式以量測耗時，同一階段巢狀呼叫時只計算最外層"""
+
+    def __init__(self):
+        self.current: Dict[str, float] = {}
+        self.queries = 0
+        self._active = set()
+
+    def wrap(self, owner, name: str, stage: str) -> None:
+        original = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            if stage in self._active:
+                return original(*args, **kwargs)
+
+            self._active.add(stage)
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.current[stage] = self.current.get(stage, 0.0) + time.perf_counter() - start
+                self._active.discard(stage)
+
+        setattr(owner, name, timed)
+
+    def count_query(self, *args) -> None:
+        self.queries += 1
+
+    def reset(self) -> None:
+        self.current = {}
+        self.queries = 0
+
+
+def instrument(recorder: StageRecorder) -> None:
+    recorder.wrap(views.handler, "parse", "parse")
+    recorder.wrap(views, "get_profile", "profile")
+    for name in ("select_category", "select_subject", "select_mode", "question", "question_result", "question_review"):
+        recorder.wrap(views.builder, name, "build")
+    recorder.wrap(views.builder, "reply", "reply")
+    for name in ("get_categorys", "get_subjects", "get_subject", "get_deck", "get_card", "get_question", "get_questions"):
+        recorder.wrap(QuestionBank, name, "query")
+    recorder.wrap(QuestionRandomizer, "process_variables", "randomize")
+    event.listen(get_engine(), "before_cursor_execute", recorder.count_query)
+
+
+def scenarios(subject_id: int, size: int) -> Dict[str, Callable[[random.Random], str]]:
+    initialize = QuestionPostback.initialize
+    TEST = QuestionPostback.QuestionModeType.TEST
+
+    # 奇數題答錯，長度受 postback 300 字限制
+    reply_answer = ("*A" * size)[:min(size, 1000)]
+
+    def shared(rng: random.Random) -> str:
+        # 同一班使用相同種子作答前 10 題，第 k 題的作答紀錄為各自的前 k 題答案
+        question_index = rng.randrange(min(size, 10))
+        return initialize(
+            flag=3, category_id=1, subject_id=subject_id, mode=TEST,
+            question_index=question_index, question_seed=1234,
+            reply_answer="".join(rng.choice("ABCD*") for _ in range(question_index)))
+
+    return {
+        "category": lambda rng: initialize(flag=0),
+        "subject": lambda rng: initialize(flag=1, category_id=1),
+        "mode": lambda rng: initialize(flag=2, category_id=1, subject_id=subject_id),
+        "question": lambda rng: initialize(
+            flag=3, category_id=1, subject_id=subject_id, mode=TEST,
+            question_index=rng.randrange(size), question_seed=rng.randint(0, 65535)),
+        "shared": shared,
+        "result": lambda rng: initialize(
+            flag=3, category_id=1, subject_id=subject_id, mode=TEST,
+            question_index=size, question_seed=rng.randint(0, 65535), reply_answer=reply_answer),
+        "review": lambda rng: initialize(
+            flag=4, category_id=1, subject_id=subject_id, mode=TEST,
+            question_index=rng.randrange(1, len(reply_answer), 2) if len(reply_answer) > 1 else 0,
+            question_seed=rng.randint(0, 65535), reply_answer=reply_answer),
+    }
+
+
+class WebhookClient:
+
+    def __init__(self):
+        self.factory = RequestFactory()
+        self.sequence = 0
+
+    def post(self, data: str, user_id: str = "Ubenchmark"):
+        self.sequence += 1
+        body = json.dumps({
+            "destination": "Ubot",
+            "events": [{
+                "type": "postback",
+                "mode": "active",
+                "timestamp": int(time.time() * 1000),
+                "source": {"type": "user", "userId": user_id},
+                "webhookEventId": f"benchmark-{self.sequence}",
+                "deliveryContext": {"isRedelivery": False},
+                "replyToken": f"reply-{self.sequence}",
+                "postback": {"data": data}
+            }]
+        })
+        signature = base64.b64encode(hmac.new(CHANNEL_SECRET.encode(), body.encode(), hashlib.sha256).digest()).decode()
+        request = self.factory.post("/line-bot/", data=body, content_type="application/json", HTTP_X_LINE_SIGNATURE=signature)
+
+        response = views.callback(request)
+        if response.status_code != 200:
+            raise RuntimeError(f"callback returned {response.status_code}")
+
+
+def clear_caches() -> None:
+    QuestionBank.invalidate_catalog()
+    menu_cache.clear()
+    render_cache.clear()
+    profile_cache.clear()
+
+
+def run_case(client: WebhookClient, recorder: StageRecorder, build: Callable[[random.Random], str], repeat: int, cold: bool) -> Dict:
+    rng = random.Random(0)
+    samples: Dict[str, List[float]] = defaultdict(list)
+    queries: List[int] = []
+
+    for _ in range(repeat):
+        data = build(rng)
+        if cold:
+            clear_caches()
+        recorder.reset()
+
+        start = time.perf_counter()
+        client.post(data)
+        samples["total"].append(time.perf_counter() - start)
+
+        for stage in STAGES[1:]:
+            samples[stage].append(recorder.current.get(stage, 0.0))
+        queries.append(recorder.queries)
+
+    # 記憶體配置另跑一輪：每次請求的峰值與結束後仍保留的配置
+    rng = random.Random(0)
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(min(repeat, 20)):
+            data = build(rng)
+            if cold:
+                clear_caches()
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            client.post(data)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "stages": {stage: percentiles(samples[stage]) for stage in STAGES},
+        "queries": percentiles(queries),
+        "alloc_peak": percentiles(peaks),
+        "alloc_retained": percentiles(retained),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(sizes, repeat, cold) -> Dict:
+    seed_bank(get_engine(), sizes)
+
+    recorder = StageRecorder()
+    instrument(recorder)
+    client = WebhookClient()
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "flex_mode": views.flex_mode,
+        "repeat": repeat,
+        "cold": cold,
+        "cases": []
+    }
+
+    print(f"{'size':>6} {'flag':<9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'build p50':>10} {'reply p50':>10} {'queries':>8} {'peak KiB':>9}")
+    for subject_id, size in enumerate(sizes, start=1):
+        for name, build in scenarios(subject_id, size).items():
+            case = run_case(client, recorder, build, repeat, cold)
+            case.update(size=size, flag=name)
+            results["cases"].append(case)
+
+            total = case["stages"]["total"]
+            print(f"{size:>6} {name:<9} {total['p50'] * 1e3:>9.2f} {total['p95'] * 1e3:>9.2f} {total['p99'] * 1e3:>9.2f}"
+                  f" {case['stages']['build']['p50'] * 1e3:>10.2f} {case['stages']['reply']['p50'] * 1e3:>10.2f}"
+                  f" {case['queries']['mean']:>8.1f} {case['alloc_peak']['p50'] / 1024:>9.1f}")
+
+    results["stub"] = {
+        "profile_requests": stub.counts["profile"],
+        "reply_requests": stub.counts["reply"],
+        "reply_bytes": stub.reply_bytes,
+        "connections": len(stub.connections)
+    }
+    return results
+
+
+def compare(results: Dict, previous: Dict) -> None:
+    baseline = {(case["size"], case["flag"]): case for case in previous["cases"]}
+
+    print(f"\ncompared with {previous.get('revision')} ({previous.get('timestamp')})")
+    print(f"{'size':>6} {'flag':<9} {'stage':<10} {'before':>9} {'after':>9} {'change':>8}")
+    for case in results["cases"]:
+        old = baseline.get((case["size"], case["flag"]))
+        if old is None:
+            continue
+        for stage in STAGES:
+            before = old["stages"][stage].get("p50", 0.0)
+            after = case["stages"][stage].get("p50", 0.0)
+            if not before:
+                continue
+            print(f"{case['size']:>6} {case['flag']:<9} {stage:<10} {before * 1e3:>9.2f} {after * 1e3:>9.2f} {(after / before - 1) * 100:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--cold", action="store_true", help="每次請求前清除題庫、選單、訊息與使用者資料快取")
+    parser.add_argument("--output", default=None, help="結果 JSON 路徑，預設為 benchmarks/results/postback-<時間>.json")
+    parser.add_argument("--compare", default=None, help="與先前的結果 JSON 比較")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.cold)
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results",
+        f"postback-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+    print(f"\nresults saved to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+QuestionBank 各查詢路徑在有無索引時的 SQLite 查詢計畫與耗時：
+
+    get_subjects:  依類科列出科目
+    get_deck:      科目的題目編號
+    get_card:      單題與其選項、答案、變數
+    get_questions: 舊版整個科目的題目 (含所有關聯)
+
+以合成題庫 (--subjects 個科目，每科 --size 題) 執行實際的 QuestionBank 方法，
+記錄其送出的 SQL 與 EXPLAIN QUERY PLAN，並分別量測只執行 SQL (sql) 與整個方法 (method) 的耗時，
+每次量測前清除快取。
+
+    python -m benchmarks.bench_query_plan [--subjects 20] [--size 5000] [--repeat 20]
+"""
+import argparse
+import os
+import tempfile
+
+# 題庫寫入暫存檔，需在匯入 question_bank.database 之前設定
+_database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ["connectString"] = f"sqlite:///{_database.name}"
+
+from benchmarks.common import measure, percentiles, seed_bank
+
+from sqlalchemy import event
+
+from question_bank.database import QuestionBank, get_engine
+from question_bank.models import Base
+
+
+def access_paths(subjects: int):
+    subject_id = subjects // 2 + 1
+    deck = QuestionBank.get_deck(category_id=1, subject_id=subject_id)
+    question_id = deck.question_ids[len(deck) // 2]
+
+    return subject_id, [
+        ("get_subjects", lambda: QuestionBank.get_subjects(category_id=1)),
+        ("get_deck", lambda: QuestionBank.get_deck(category_id=1, subject_id=subject_id)),
+        ("get_card", lambda: QuestionBank.get_card(category_id=1, subject_id=subject_id, question_id=question_id)),
+        ("get_questions", lambda: QuestionBank.get_questions(category_id=1, subject_id=subject_id)),
+    ]
+
+
+def reset_caches(subject_id: int) -> None:
+    # get_deck、get_card 會先取得科目，預先載入以只計算目標查詢
+    QuestionBank.invalidate_catalog()
+    QuestionBank.get_subject(category_id=1, subject_id=subject_id)
+
+
+def capture_statements(func, subject_id: int):
+    """執行 func 並回傳其送出的 (SQL, 參數)"""
+    reset_caches(subject_id)
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = get_engine()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        func()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def query_plan(statement: str, parameters) -> list:
+    with get_engine().connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def execute_statements(statements) -> None:
+    with get_engine().connect() as connection:
+        for statement, parameters in statements:
+            connection.exec_driver_sql(statement, parameters).fetchall()
+
+
+def set_indexes(enabled: bool) -> None:
+    with get_engine().begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if enabled:
+                    index.create(connection, checkfirst=True)
+                else:
+                    index.drop(connection, checkfirst=True)
+        connection.exec_driver_sql("ANALYZE")
+
+
+def run(subjects, size, repeat):
+    seed_bank(get_engine(), [size] * subjects)
+    subject_id, paths = access_paths(subjects)
+
+    results = {}
+    for label, enabled in (("without indexes", False), ("with indexes", True)):
+        set_indexes(enabled)
+        print(f"\n== {label} ==")
+        for name, func in paths:
+            statements = capture_statements(func, subject_id)
+            for statement, parameters in statements:
+                print(f"\n[{name}] {' '.join(statement.split())[:120]}")
+                for detail in query_plan(statement, parameters):
+                    print(f"    {detail}")
+
+            def call():
+                reset_caches(subject_id)
+                func()
+
+            # sql: 只執行 SQL 並取回結果 / method: 含 ORM 物件與快取資料的建立
+            results[(label, name, "sql")] = percentiles(measure(lambda: execute_statements(statements), repeat))
+            results[(label, name, "method")] = percentiles(measure(call, repeat))
+
+    print(f"\n{'query':<14} {'':<7} {'no index p50 (ms)':>18} {'index p50 (ms)':>15} {'speedup':>8}")
+    for name, _ in paths:
+        for kind in ("sql", "method"):
+            before = results[("without indexes", name, kind)]["p50"]
+            after = results[("with indexes", name, kind)]["p50"]
+            print(f"{name:<14} {kind:<7} {before * 1e3:>18.2f} {after * 1e3:>15.2f} {before / after:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subjects", type=int, default=20)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        run(args.subjects, args.size, args.repeat)
+    finally:
+        get_engine().dispose()
+        os.unlink(_database.name)
+
+
+if __name__ == "__main__":
+    main()
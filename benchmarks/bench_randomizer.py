@@ -0,0 +1,80 @@
+"""
+比較 QuestionRandomizer 複製題目的成本 (每次算繪)：
+
+    deepcopy: 原本的作法，deepcopy 整個 ORM Question (含 category、subject.questions 等關聯) 後洗牌選項
+    card:     以 QuestionCard 透過 dataclasses.replace 產生新的唯讀資料後洗牌選項
+
+變數運算兩者相同，另以 render 列出含 process_variables 的完整算繪時間。
+
+    python -m benchmarks.bench_randomizer [--sizes 20 200 2000] [--repeat 200]
+"""
+import argparse
+import hashlib
+import random
+import tracemalloc
+
+from copy import deepcopy
+
+from benchmarks.common import measure, percentiles, seed_bank
+
+from question_bank.database import QuestionBank, QuestionRandomizer, get_engine
+
+
+def deepcopy_randomize(question, random_seed):
+    # 原本 QuestionRandomizer.__init__ 的作法
+    question = deepcopy(question)
+    seed_generator = random.Random(random_seed + int(hashlib.md5(question.content.encode()).hexdigest()[:10], 16)).random
+    random.Random(seed_generator()).shuffle(question.options)
+    return question
+
+
+def card_randomize(question, random_seed):
+    return QuestionRandomizer(question, random_seed).question
+
+
+def card_render(question, random_seed):
+    randomizer = QuestionRandomizer(question, random_seed)
+    randomizer.process_variables()
+    return randomizer.question
+
+
+def peak_memory(func) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, repeat):
+    seed_bank(get_engine(), sizes)
+
+    print(f"{'size':>6} {'path':<9} {'p50 (us)':>10} {'p95 (us)':>10} {'peak (KiB)':>11}")
+    for subject_id, size in enumerate(sizes, start=1):
+        orm_question = QuestionBank.get_questions(category_id=1, subject_id=subject_id)[0]
+        deck = QuestionBank.get_deck(category_id=1, subject_id=subject_id)
+        card = deck.card(deck.question_ids[0])
+
+        cases = [
+            ("deepcopy", deepcopy_randomize, orm_question),
+            ("card", card_randomize, card),
+            ("render", card_render, card),
+        ]
+        for name, func, question in cases:
+            seeds = iter(range(repeat))
+            stats = percentiles(measure(lambda: func(question, next(seeds)), repeat))
+            peak = peak_memory(lambda: func(question, 0))
+            print(f"{size:>6} {name:<9} {stats['p50'] * 1e6:>10.1f} {stats['p95'] * 1e6:>10.1f} {peak / 1024:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
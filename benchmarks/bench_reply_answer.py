@@ -0,0 +1,116 @@
+"""
+比較 ReplyAnswer 新舊編碼的吞吐量與載入成本：
+
+    legacy: 原本以 itertools.product 建立 2 張 16,807 筆對照表，每字元 5 題
+    packed: 目前的 6 進位打包編碼，每 2 字元 11 題，解碼時以 216、1,296 筆的小表查 3 + 4 + 4 題
+
+    python -m benchmarks.bench_reply_answer [--lengths 10 100 1000] [--repeat 2000]
+"""
+import argparse
+import itertools
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import measure, percentiles
+
+from line_bot.utils.postback import QuestionPostback
+
+
+class LegacyReplyAnswer:
+    """原本的對照表編碼 (與改版前的 QuestionPostback.ReplyAnswer 相同，以類別屬性查表)，僅供比較"""
+
+    chr_range = range(int("4E00", 16), int("9FFF", 16))
+    encode_map = None
+    decode_map = None
+
+    @staticmethod
+    def build():
+        chr_range = LegacyReplyAnswer.chr_range
+        LegacyReplyAnswer.encode_map = {"".join(k): chr(v) for k, v in zip(itertools.product(*["ABCDE*-"]*5), chr_range)}
+        LegacyReplyAnswer.decode_map = {chr(k): "".join(v) for k, v in zip(chr_range, itertools.product(*["ABCDE*-"]*5))}
+
+    @staticmethod
+    def encode(string):
+        result = ""
+        for i in range(0, len(string), 5):
+            s = string[i: 5+i]
+            if len(s) < 5:
+                s += "-" * ((5 - len(string)) % 5)
+            try:
+                result += LegacyReplyAnswer.encode_map[s]
+            except KeyError:
+                raise ValueError(f"Invalid segment: {s}")
+        return result
+
+    @staticmethod
+    def decode(string):
+        result = ""
+        for s in string:
+            try:
+                result += LegacyReplyAnswer.decode_map[s]
+            except KeyError:
+                raise ValueError(f"Invalid character: {s}")
+        return result.replace("-", "")
+
+
+def import_time() -> float:
+    # 於新的直譯器中計時，避免模組快取影響
+    code = (
+        "import time; start = time.perf_counter(); "
+        "import line_bot.utils.postback; print(time.perf_counter() - start)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(output)
+
+
+def run(lengths, repeat):
+    tracemalloc.start()
+    start = time.perf_counter()
+    LegacyReplyAnswer.build()
+    legacy_tables = time.perf_counter() - start
+    legacy_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"legacy table build: {legacy_tables * 1e3:.1f} ms, {legacy_memory / 1024:.0f} KiB")
+    print(f"postback module import (packed): {import_time() * 1e3:.1f} ms")
+
+    packed = QuestionPostback.ReplyAnswer
+    start = time.perf_counter()
+    packed._digit_groups()
+    print(f"packed digit tables (first decode): {(time.perf_counter() - start) * 1e3:.2f} ms")
+    print()
+    rng = random.Random(0)
+
+    print(f"{'answers':>7} {'codec':<7} {'chars':>5} {'encode p50 (us)':>16} {'decode p50 (us)':>16}")
+    for length in lengths:
+        answers = "".join(rng.choice("ABCDE*") for _ in range(length))
+        variants = (("legacy", LegacyReplyAnswer), ("packed", packed))
+        encoded = {name: codec.encode(answers) for name, codec in variants}
+        for name, codec in variants:
+            assert codec.decode(encoded[name]) == answers
+
+        # 兩種編碼輪流分批計時，降低機器負載變動對比較的影響
+        samples = {(name, stage): [] for name, _ in variants for stage in ("encode", "decode")}
+        for start in range(0, repeat, 100):
+            batch = min(100, repeat - start)
+            for name, codec in variants:
+                samples[name, "encode"] += measure(lambda: codec.encode(answers), batch)
+                samples[name, "decode"] += measure(lambda: codec.decode(encoded[name]), batch)
+
+        for name, _ in variants:
+            encode, decode = (percentiles(samples[name, stage]) for stage in ("encode", "decode"))
+            print(f"{length:>7} {name:<7} {len(encoded[name]):>5} {encode['p50'] * 1e6:>16.1f} {decode['p50'] * 1e6:>16.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.lengths, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import logging
+import os
+import statistics
+import time
+
+from typing import Callable, Dict, List, Sequence
+
+# 壓測預設使用記憶體內 SQLite，需在匯入 question_bank.database 之前設定
+os.environ.setdefault("connectString", "sqlite://")
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from question_bank.models import (
+    Base,
+    Category,
+    Subject,
+    Question,
+    QuestionOption,
+    QuestionAnswer,
+    QuestionVariable
+)
+
+
+def quiet_logging() -> None:
+    """
+    壓測會送出大量 postback：關閉 line_bot 的 DEBUG 紀錄，
+    並移除 settings.LOGGING 寫入專案根目錄 debug.log 的 FileHandler
+    """
+    logging.getLogger("line_bot").setLevel(logging.WARNING)
+    for name in ("django", "line_bot"):
+        logger = logging.getLogger(name)
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.FileHandler):
+                logger.removeHandler(handler)
+                handler.close()
+
+
+def seed_bank(engine, subject_sizes: Sequence[int] = (20,), *, options: int = 4, batch_size: int = 1000) -> None:
+    """建立合成題庫：一個類科，第 i 個科目 (SubjectID = i + 1) 有 subject_sizes[i] 題"""
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session, session.begin():
+        session.execute(insert(Category), [{
+            "category_id": 1,
+            "name": "數學",
+            "background_image": "https://example.com/category-1.png;https://example.com/category-2.png"
+        }])
+        session.execute(insert(Subject), [{
+            "subject_id": subject_id,
+            "category_id": 1,
+            "name": f"科目{subject_id}",
+            "description": "基本運算\n代數",
+            "background_image": "https://example.com/subject.png"
+        } for subject_id in range(1, len(subject_sizes) + 1)])
+
+    question_id = 0
+    for subject_id, questions in enumerate(subject_sizes, start=1):
+        for start in range(0, questions, batch_size):
+            rows, option_rows, answer_rows, variable_rows = [], [], [], []
+            for _ in range(start, min(start + batch_size, questions)):
+                question_id += 1
+                rows.append({
+                    "question_id": question_id,
+                    "category_id": 1,
+                    "subject_id": subject_id,
+                    "content": f"第{question_id}題：{{a}} + {{b}} = ?"
+                })
+                option_rows.extend({
+                    "option_id": option_id,
+                    "question_id": question_id,
+                    "content": f"{{a}} + {option_id}"
+                } for option_id in range(1, options + 1))
+                answer_rows.append({"question_id": question_id, "option_id": 1})
+                variable_rows.append({"question_id": question_id, "variable_name": "a", "variable_value": "randint(1, 100)"})
+                variable_rows.append({"question_id": question_id, "variable_name": "b", "variable_value": "uniform_r(0, 10, 2)"})
+
+            with Session(engine) as session, session.begin():
+                session.execute(insert(Question), rows)
+                session.execute(insert(QuestionOption), option_rows)
+                session.execute(insert(QuestionAnswer), answer_rows)
+                session.execute(insert(QuestionVariable), variable_rows)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"n": 0}
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pick(50),
+        "p95": pick(95),
+        "p99": pick(99),
+        "max": ordered[-1],
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
@@ -0,0 +1,66 @@
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class LineApiStubHandler(BaseHTTPRequestHandler):
+    """本機替代的 Messaging API：回傳固定的 profile 與 reply 結果"""
+
+    protocol_version = "HTTP/1.1"
+    # 標頭與內容分開寫入，避免 Nagle 與 delayed ACK 造成約 40ms 延遲
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload: dict) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # /v2/bot/profile/{userId}
+        self.server.record("profile", self.client_address)
+        self._send({"userId": self.path.rsplit("/", 1)[-1], "displayName": "benchmark"})
+
+    def do_POST(self):
+        # /v2/bot/message/reply
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        self.server.record("reply", self.client_address, len(body))
+        self._send({"sentMessages": [{"id": "1", "quoteToken": "benchmark"}]})
+
+
+class LineApiStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0), latency: float = 0.0):
+        super().__init__(address, LineApiStubHandler)
+        # 每個請求回應前的延遲 (秒)，模擬實際 Messaging API 的往返時間
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.counts = {"profile": 0, "reply": 0}
+        self.reply_bytes = 0
+        self.connections = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def record(self, kind: str, client_address, size: int = 0) -> None:
+        with self._lock:
+            self.counts[kind] += 1
+            self.reply_bytes += size
+            self.connections.add(client_address)
+
+    def start(self) -> "LineApiStub":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
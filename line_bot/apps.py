@@ -1,6 +1,14 @@
+import os
+
 from django.apps import AppConfig
 
 
 class LineBotConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "line_bot"
+
+    def ready(self):
+        # 於背景預熱資料庫連線，不阻塞 worker 啟動
+        if os.environ.get("db_warmup", "true").lower() in ("1", "true", "yes"):
+            from question_bank.database import readiness
+            readiness.warm_up()
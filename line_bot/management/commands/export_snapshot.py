@@ -0,0 +1,34 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from sqlalchemy.exc import SQLAlchemyError
+
+from question_bank.database import SNAPSHOT_PATH, get_engine
+from question_bank.snapshot import export_snapshot
+
+
+class Command(BaseCommand):
+    help = "將題庫匯出為唯讀 SQLite 快照，設定環境變數 question_bank_snapshot=<檔案> 後改由快照提供題庫"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="快照檔路徑 (已存在時覆寫)")
+        parser.add_argument("--batch-size", type=int, default=5000, help="每次讀取、寫入的資料列數")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if SNAPSHOT_PATH and os.path.abspath(SNAPSHOT_PATH) == os.path.abspath(path):
+            raise CommandError("目前的題庫來源即為此快照，請改用 connectString 連線至原資料庫後匯出")
+
+        started = time.perf_counter()
+        try:
+            counts = export_snapshot(get_engine(), path, batch_size=options["batch_size"], progress=self.progress)
+        except SQLAlchemyError as e:
+            raise CommandError(f"匯出失敗: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"已匯出 {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MiB, {time.perf_counter() - started:.1f} 秒): "
+            + ", ".join(f"{table} {count}" for table, count in counts.items())))
+
+    def progress(self, table: str, rows: int) -> None:
+        self.stdout.write(f"{table}: {rows}")
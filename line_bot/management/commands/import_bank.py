@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from sqlalchemy.exc import SQLAlchemyError
+
+from question_bank.database import QuestionBank
+from question_bank.exception import ImportRecordError
+from question_bank.importer import BankImporter, BankValidator, ImportStats, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        "從 CSV / JSONL 匯入題庫 (類科、科目、題目、選項、答案、變數)。"
+        "匯入前會先完整檢查一次檔案，有錯誤時不寫入任何資料。"
+        "未指定 question_id 的題目若與同科目中的題目 (題目與選項) 相同則略過，重新匯入同一個檔案不會重複新增"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="題庫檔，副檔名為 .csv 時視為 CSV，其餘視為 JSONL")
+        parser.add_argument("--format", choices=("csv", "jsonl"), default=None, help="檔案格式，預設依副檔名判斷")
+        parser.add_argument("--batch-size", type=int, default=1000, help="每個交易寫入的題目數")
+        parser.add_argument("--dry-run", action="store_true", help="只檢查檔案，不寫入資料庫")
+        parser.add_argument("--max-errors", type=int, default=20, help="最多列出的錯誤數")
+
+    def handle(self, *args, **options):
+        path, file_format = options["path"], options["format"]
+
+        try:
+            categories, subjects, question_ids = BankImporter.existing_catalog()
+        except SQLAlchemyError as e:
+            raise CommandError(f"無法讀取資料庫: {e}")
+
+        checked = self.validate(path, file_format, BankValidator(categories, subjects, question_ids), options["max_errors"])
+        self.stdout.write(self.style.SUCCESS(f"檢查完成: {checked} 筆資料"))
+        if options["dry_run"]:
+            return
+
+        importer = BankImporter(batch_size=options["batch_size"], progress=self.progress)
+        try:
+            stats = importer.run(read_records(path, file_format))
+        except (ImportRecordError, SQLAlchemyError) as e:
+            raise CommandError(f"匯入失敗，已寫入的批次不會復原 ({self.summary(importer.stats)}): {e}")
+        finally:
+            # 同一程序內的快取 (執行中的服務需等快取過期)
+            QuestionBank.invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f"匯入完成: {self.summary(stats)}"))
+
+    def validate(self, path, file_format, validator: BankValidator, max_errors: int) -> int:
+        errors = []
+        checked = 0
+        try:
+            for line, record in read_records(path, file_format, errors):
+                checked += 1
+                try:
+                    validator.validate(record)
+                except ValueError as e:
+                    errors.append(ImportRecordError(line, str(e)))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if errors:
+            for error in errors[:max_errors]:
+                self.stderr.write(str(error))
+            if len(errors) > max_errors:
+                self.stderr.write(f"... 另有 {len(errors) - max_errors} 個錯誤")
+            raise CommandError(f"檢查失敗: {len(errors)} 個錯誤，未寫入任何資料")
+        return checked
+
+    def progress(self, stats: ImportStats, line: int, elapsed: float) -> None:
+        rate = stats.questions / elapsed if elapsed else 0
+        self.stdout.write(f"第 {line} 行: {stats.questions} 題 ({rate:.0f} 題/秒)")
+
+    @staticmethod
+    def summary(stats: ImportStats) -> str:
+        return ", ".join(f"{name} {count}" for name, count in stats.as_dict().items())
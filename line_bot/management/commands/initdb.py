@@ -0,0 +1,53 @@
+import time
+
+from typing import List
+
+from django.core.management.base import BaseCommand, CommandError
+from sqlalchemy import inspect
+from sqlalchemy.exc import OperationalError
+
+from question_bank.database import get_engine
+from question_bank.models import Base
+
+
+class Command(BaseCommand):
+    help = "建立題庫資料表 (已存在的資料表只補上缺少的索引)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retries", type=int, default=5, help="連線失敗時的重試次數")
+        parser.add_argument("--interval", type=float, default=5, help="重試間隔秒數")
+
+    def handle(self, *args, **options):
+        retries = options["retries"]
+        engine = get_engine()
+
+        while True:
+            try:
+                Base.metadata.create_all(engine)
+                break
+            except OperationalError as e:
+                if retries <= 0:
+                    raise CommandError(f"無法連線至資料庫: {e}")
+                self.stderr.write(f"連線失敗，重試中... ({retries} 次剩餘)")
+                retries -= 1
+                time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"資料表已建立: {', '.join(sorted(Base.metadata.tables))}"))
+
+        with engine.begin() as connection:
+            created = self.create_indexes(connection)
+        if created:
+            self.stdout.write(self.style.SUCCESS(f"已建立索引: {', '.join(created)}"))
+
+    @staticmethod
+    def create_indexes(connection) -> List[str]:
+        """create_all 不會替已存在的資料表建立索引，需逐一補上"""
+        created = []
+        for table in Base.metadata.sorted_tables:
+            existing = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name not in existing:
+                    index.create(connection, checkfirst=True)
+                    created.append(index.name)
+        return created
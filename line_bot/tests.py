@@ -1,3 +1,541 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import math
+import os
+import random
+import tempfile
 
-# Create your tests here.
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from line_bot.utils.dedupe import EventDeduplicator, MemoryDeduplicator
+from line_bot.utils.dispatcher import LineWebhookHandler
+from line_bot.utils.postback import QuestionPostback
+from line_bot.utils.raw_template import RawTemplateBuilder
+from line_bot.utils.template_builder import TemplateBuilder
+from line_bot.utils.throttle import RequestThrottle
+from linebot.v3.messaging.models import ReplyMessageRequest
+from linebot.v3.webhooks import Event, PostbackEvent
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import StaticPool
+from question_bank import database
+from question_bank.catalog import CategoryRecord, SubjectRecord
+from question_bank.database import QuestionBank, QuestionRandomizer, Session
+from question_bank.deck import OptionCard, QuestionCard, VariableCard
+from question_bank.exception import ImportRecordError
+from question_bank.expression import compile_expression, evaluate, expression_namespace, validate_variable_name
+from question_bank.importer import BankImporter, BankValidator, normalize, read_records
+from question_bank.models import Base, Question
+from question_bank.permutation import SeededPermutation, seeded_position
+
+
+class ExpressionTests(SimpleTestCase):
+    """變數運算式的 AST 白名單"""
+
+    def assertRejected(self, source):
+        with self.assertRaises(ValueError):
+            compile_expression(source)
+
+    def test_reject_attribute_access(self):
+        self.assertRejected("pi.real")
+        self.assertRejected("().__class__")
+        self.assertRejected("'{}'.format(1)")
+
+    def test_reject_dunder_names(self):
+        self.assertRejected("__import__('os')")
+        self.assertRejected("__builtins__")
+        self.assertRejected("eval('1')")
+
+    def test_reject_lambda(self):
+        self.assertRejected("(lambda: 1)()")
+        self.assertRejected("lambda x: x")
+
+    def test_reject_comprehensions(self):
+        self.assertRejected("[x for x in (1, 2)]")
+        self.assertRejected("{x for x in (1, 2)}")
+        self.assertRejected("{x: x for x in (1, 2)}")
+        self.assertRejected("max(x for x in (1, 2))")
+
+    def test_reject_subscripts(self):
+        self.assertRejected("(1, 2)[0]")
+        self.assertRejected("'abc'[::-1]")
+
+    def test_reject_argument_unpacking(self):
+        self.assertRejected("round(**{'number': 1.5})")
+        self.assertRejected("max(*(1, 2))")
+
+    def test_reject_other_syntax(self):
+        self.assertRejected("(x := 1)")
+        self.assertRejected("f'{pi}'")
+        self.assertRejected("[1, 2]")
+        self.assertRejected("None")
+        self.assertRejected("1; 2")
+
+    def test_reject_unbounded_results(self):
+        # 次方、左移與字串、tuple 重複的結果大小不受限制，math.pow 會在溢位時拋出 OverflowError
+        self.assertRejected("9**9**9**9")
+        self.assertRejected("2 ** randint(1, 8)")
+        self.assertRejected("1 << 10000000000")
+        self.assertRejected("'x'*10**10")
+        self.assertRejected("'x' * 10000000000")
+        self.assertRejected("10000000000 * (1, 2)")
+        self.assertRejected("choice(('a', 'b')) * randint(1, 10)")
+        self.assertRejected("(randint(0, 1) and 'a' or 'b') * 3")
+        self.assertRejected("'%0999999999d' % 1")
+
+    def test_allow_numeric_arithmetic(self):
+        for source in ("choice((1, 2, 3)) * 10", "max(1, 2) * randint(1, 6) % 7", "pow(2, 10) * 3", "'a' + choice(('b', 'c'))"):
+            compile_expression(source)
+
+    def test_variable_name(self):
+        validate_variable_name("x_1")
+        for name in ("__x", "a__b", "1a", "a-b", ""):
+            with self.assertRaises(ValueError):
+                validate_variable_name(name)
+
+    @staticmethod
+    def legacy_evaluate(sources, seed):
+        """舊版 process_variables 的作法：以含種子函式的 dict 直接 eval 原始字串"""
+        seed_generator = random.Random(seed).random
+
+        def randint(a, b):
+            return random.Random(seed_generator()).randint(a, b)
+
+        def uniform(a, b):
+            return random.Random(seed_generator()).uniform(a, b)
+
+        def uniform_r(a, b, ndigits):
+            return round(uniform(a, b), ndigits)
+
+        def choice(seq):
+            return random.Random(seed_generator()).choice(seq)
+
+        safe_dict = dict((f, getattr(math, f)) for f in ("sqrt", "pi", "pow", "floor", "log10"))
+        safe_dict.update(abs=abs, max=max, min=min, round=round,
+                         randint=randint, uniform=uniform, choice=choice, uniform_r=uniform_r)
+        return [eval(source, {"__builtins__": None}, safe_dict) for source in sources]
+
+    def test_seeded_results_match_legacy_eval(self):
+        sources = [
+            "randint(1, 10)",
+            "uniform(0, 1)",
+            "uniform_r(1, 100, 2)",
+            "choice(('甲', '乙', '丙'))",
+            "round(sqrt(16) * pi, 2)",
+            "randint(1, 6) + randint(1, 6) * 10",
+            "max(randint(1, 3), 2) if randint(0, 1) else -floor(log10(1000))",
+            "pow(2, randint(1, 8)) / 4",
+        ]
+        for seed in (0, 1, 42, 65535, 123456789):
+            seed_generator = random.Random(seed).random
+            namespace = expression_namespace(seed_generator)
+            values = [evaluate(compile_expression(source), namespace) for source in sources]
+            self.assertEqual(values, self.legacy_evaluate(sources, seed), f"seed={seed}")
+
+
+class ReplyAnswerTests(SimpleTestCase):
+    """作答紀錄編碼"""
+
+    ReplyAnswer = QuestionPostback.ReplyAnswer
+
+    @staticmethod
+    def legacy_encode(string):
+        """舊版編碼：每 5 題一個字元 (U+4E00 起)，不足 5 題以 "-" 補齊"""
+        encode_map = {"".join(k): chr(v) for k, v in zip(itertools.product(*["ABCDE*-"] * 5), range(0x4E00, 0x9FFF))}
+        padded = string + "-" * (-len(string) % 5)
+        return "".join(encode_map[padded[i: i + 5]] for i in range(0, len(padded), 5))
+
+    def test_round_trip(self):
+        rng = random.Random(0)
+        for length in range(0, 1546):
+            string = "".join(rng.choice("ABCDE*") for _ in range(length))
+            encoded = self.ReplyAnswer.encode(string)
+            self.assertLess(len(encoded), 282, f"length={length}")
+            self.assertEqual(self.ReplyAnswer.decode(encoded), string, f"length={length}")
+
+    def test_round_trip_uniform(self):
+        for symbol in "ABCDE*":
+            for length in (1, 5, 6, 11, 12, 22, 1545):
+                string = symbol * length
+                self.assertEqual(self.ReplyAnswer.decode(self.ReplyAnswer.encode(string)), string)
+
+    def test_decode_legacy(self):
+        rng = random.Random(1)
+        for length in list(range(0, 60)) + [281 * 5 - 1, 281 * 5]:
+            string = "".join(rng.choice("ABCDE*") for _ in range(length))
+            self.assertEqual(self.ReplyAnswer.decode(self.legacy_encode(string)), string, f"length={length}")
+
+    def test_decode_legacy_postback(self):
+        # 聊天紀錄中舊版按鈕的 postback 資料
+        string = "*A*B*C*D*E" * 7
+        row_string = QuestionPostback.initialize(flag=4, category_id=1, subject_id=2, question_seed=42)
+        postback = QuestionPostback(None, row_string + self.legacy_encode(string))
+        self.assertEqual(postback.reply_answer, string)
+        self.assertEqual(postback.question_seed, 42)
+
+    def test_reject_invalid_symbols(self):
+        for string in ("F", "a", "-", "AB-", "*" * 11 + "x"):
+            with self.assertRaises(ValueError):
+                self.ReplyAnswer.encode(string)
+
+    def test_reject_out_of_range_characters(self):
+        # 各字元區段的前後、ASCII、BMP 以外的字元及 6 進位溢位的 2 字元組
+        for string in ("a", "0", chr(0x33FF), chr(0x8FFF), chr(0xA000), chr(0xD700), chr(0xE000), "\U00020000"):
+            with self.assertRaises(ValueError, msg=repr(string)):
+                self.ReplyAnswer.decode(string)
+
+        radix = self.ReplyAnswer.radix
+        overflow = 6 ** self.ReplyAnswer.chunk_size
+        high, low = divmod(overflow, radix)
+        with self.assertRaises(ValueError):
+            self.ReplyAnswer.decode(self.ReplyAnswer._to_char(high) + self.ReplyAnswer._to_char(low) + self.ReplyAnswer._to_char(0))
+
+        # 只有 1 個字元的最後一組最多 5 題
+        with self.assertRaises(ValueError):
+            self.ReplyAnswer.decode(self.ReplyAnswer._to_char(self.ReplyAnswer.length_offsets[6]))
+
+    def test_postback_length_limit(self):
+        # reply_answer 欄位最多 281 個字元，可容納 1545 題
+        self.assertEqual(len(self.ReplyAnswer.encode("*" * 1545)), 281)
+        row_string = QuestionPostback.initialize(flag=3, reply_answer="*" * 1545)
+        self.assertLessEqual(len(row_string), 300)
+        self.assertEqual(QuestionPostback(None, row_string).reply_answer, "*" * 1545)
+
+        with self.assertRaises(ValueError):
+            QuestionPostback.initialize(flag=3, reply_answer="*" * 1546)
+        with self.assertRaises(ValueError):
+            QuestionPostback(None, row_string).configure(reply_answer="*" * 1546)
+
+
+class PermutationTests(SimpleTestCase):
+    """題目順序"""
+
+    def test_shuffle_matches_legacy(self):
+        # 舊版以 random.Random(question_seed).shuffle 洗牌整個科目的題目
+        for size in (1, 2, 7, 100, 1000):
+            question_ids = sorted(random.Random(size).sample(range(1, 10 ** 6), size))
+            for seed in (0, 1, 42, 65535, 123456789):
+                legacy = list(question_ids)
+                random.Random(seed).shuffle(legacy)
+                positions = [seeded_position(size, seed, index, "shuffle") for index in range(size)]
+                self.assertEqual([question_ids[position] for position in positions], legacy, f"size={size}, seed={seed}")
+
+    def test_feistel_is_bijection(self):
+        for size in itertools.chain(range(1, 70), (255, 256, 257, 1000, 4097)):
+            for seed in (0, 7, 123456789):
+                permutation = SeededPermutation(size, seed)
+                self.assertEqual(sorted(permutation[index] for index in range(size)), list(range(size)), f"size={size}, seed={seed}")
+
+    def test_feistel_rejects_out_of_range(self):
+        permutation = SeededPermutation(10, 0)
+        for index in (-1, 10):
+            with self.assertRaises(IndexError):
+                permutation[index]
+        with self.assertRaises(ValueError):
+            SeededPermutation(0, 0)
+
+
+class FlexParityTests(SimpleTestCase):
+    """RawTemplate 直接產生的 dict 與 pydantic 模型的 to_dict() 結果相同"""
+
+    def setUp(self):
+        self.category = CategoryRecord(category_id=1, name="數學", background_image="https://example.com/1.png;https://example.com/2.png")
+        self.subject = SubjectRecord(
+            subject_id=1, category_id=1, name="代數", description="第一章\n第二章",
+            background_image="https://example.com/subject.png", category=self.category, question_count=20)
+        card = QuestionCard(
+            question_id=3, category_id=1, subject_id=1,
+            content="{x} + {y} = ?",
+            options=tuple(OptionCard(option_id=i, content=f"選項{i} {{x}}") for i in range(1, 5)),
+            answer_ids=frozenset({2}),
+            variables=(VariableCard("x", "randint(1, 10)"), VariableCard("y", "round(sqrt(16) * pi, 2)")),
+            seed_salt=12345, category=self.category, subject=self.subject)
+        randomizer = QuestionRandomizer(card, 42)
+        randomizer.process_variables()
+        self.question = randomizer.question
+
+    def postback(self, **kwargs):
+        return QuestionPostback(None, QuestionPostback.initialize(**kwargs))
+
+    def bubble_cases(self):
+        TEST, REVISE = QuestionPostback.QuestionModeType.TEST, QuestionPostback.QuestionModeType.REVISE
+        select = self.postback(flag=1, category_id=1)
+        review = self.postback(flag=4, category_id=1, subject_id=1, question_seed=42, reply_answer="A*B*C" * 4)
+        return [
+            ("category", lambda template: template.category_bubble(self.category)),
+            ("category_image", lambda template: template.category_bubble(self.category, "https://example.com/3.png")),
+            ("subject", lambda template: template.subject_bubble(self.subject, select)),
+            ("mode", lambda template: template.mode_bubble(self.subject, select)),
+            ("question_test", lambda template: template.question_bubble(self.question, self.postback(
+                flag=3, category_id=1, subject_id=1, question_index=2, question_seed=42, mode=TEST, reply_answer="*A"))),
+            ("question_revise", lambda template: template.question_bubble(self.question, self.postback(
+                flag=3, category_id=1, subject_id=1, question_index=2, question_seed=42, mode=REVISE))),
+            ("result", lambda template: template.result_bubble(self.subject, review)),
+            ("result_empty", lambda template: template.result_bubble(self.subject, self.postback(flag=3, category_id=1, subject_id=1))),
+            ("review", lambda template: template.review_bubble(self.question, 2, 0, 4, review)),
+        ]
+
+    def test_bubble_parity(self):
+        for name, build in self.bubble_cases():
+            with self.subTest(bubble=name):
+                # 選單與結果頁的背景圖片、重新測驗的種子仍為亂數
+                random.seed(0)
+                model = build(TemplateBuilder.template).to_dict()
+                random.seed(0)
+                raw = build(RawTemplateBuilder.template)
+                self.assertEqual(raw, model)
+
+    def test_reply_request_parity(self):
+        for name, build in self.bubble_cases():
+            with self.subTest(bubble=name):
+                requests = []
+                for builder in (TemplateBuilder, RawTemplateBuilder):
+                    random.seed(0)
+                    message = builder.FlexMessage(
+                        alt_text="題庫", contents=builder.FlexCarousel(contents=[build(builder.template)]))
+                    requests.append(builder.reply_request("token", [message, builder.TextMessage(text="文字")]))
+                model, raw = requests
+                self.assertEqual(raw, model.to_dict())
+                # dict 可通過 SDK 模型驗證 (line_flex_validate)
+                self.assertEqual(ReplyMessageRequest.from_dict(raw).to_dict(), model.to_dict())
+
+
+class ImporterTests(SimpleTestCase):
+    """題庫匯入：欄位正規化、檢查與重新匯入"""
+
+    CSV = (
+        "type,category_id,subject_id,question_id,name,description,content,option_1,option_2,option_3,answers,var_x\n"
+        "category,1,,,數學,,,,,,,\n"
+        "subject,1,2,,代數,第一章,,,,,,\n"
+        "question,1,2,,,,{x} + 1 = ?,{x},甲,,\"1, 2\",\"randint(1, 9)\"\n"
+        "question,1,2,7,,,題目,是,否,,2,\n"
+    )
+
+    JSONL = (
+        '{"type": "category", "category_id": 1, "name": "數學"}\n'
+        '\n'
+        '{"type": "subject", "category_id": 1, "subject_id": 2, "name": "代數", "description": "第一章"}\n'
+        '{"category_id": 1, "subject_id": 2, "content": "{x} + 1 = ?", "options": ["{x}", "甲"], "answers": [1, 2], "variables": {"x": "randint(1, 9)"}}\n'
+        '{"category_id": 1, "subject_id": 2, "question_id": 7, "content": "題目", "options": ["是", "否"], "answer": 2}\n'
+    )
+
+    def write_bank(self, suffix, text):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, f"bank{suffix}")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.write(text)
+        return path
+
+    def use_database(self):
+        """將 question_bank.database 綁定至記憶體內 SQLite，結束後還原"""
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        self.addCleanup(engine.dispose)
+        self.addCleanup(lambda: Session.configure(bind=database._engine))
+        patcher = mock.patch.object(database, "_engine", engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        Session.configure(bind=engine)
+        QuestionBank.invalidate_catalog()
+        self.addCleanup(QuestionBank.invalidate_catalog)
+        return engine
+
+    def test_normalize_csv_and_jsonl(self):
+        csv_records = list(read_records(self.write_bank(".csv", self.CSV)))
+        jsonl_records = list(read_records(self.write_bank(".jsonl", self.JSONL)))
+
+        self.assertEqual([line for line, _ in csv_records], [2, 3, 4, 5])
+        self.assertEqual([line for line, _ in jsonl_records], [1, 3, 4, 5])
+        for (_, from_csv), (_, from_jsonl) in zip(csv_records, jsonl_records):
+            self.assertEqual(from_csv, from_jsonl)
+
+        self.assertEqual(csv_records[0][1], {"type": "category", "category_id": 1, "name": "數學", "background_image": None})
+        self.assertEqual(csv_records[2][1], {
+            "type": "question", "question_id": None, "category_id": 1, "subject_id": 2, "content": "{x} + 1 = ?",
+            "options": ["{x}", "甲"], "answers": [1, 2], "variables": {"x": "randint(1, 9)"}})
+        self.assertEqual(csv_records[3][1]["question_id"], 7)
+        self.assertEqual(csv_records[3][1]["answers"], [2])
+
+    def test_read_records_collects_errors(self):
+        path = self.write_bank(".jsonl", '{"type": "unknown"}\n{"category_id": "x"}\nnot json\n' + self.JSONL)
+        errors = []
+        self.assertEqual(len(list(read_records(path, errors=errors))), 4)
+        self.assertEqual([error.line for error in errors], [1, 2, 3])
+
+        with self.assertRaises(ImportRecordError):
+            list(read_records(path))
+
+    def assertInvalid(self, validator, record, message):
+        with self.assertRaisesRegex(ValueError, message):
+            validator.validate(record)
+
+    def test_validator_errors(self):
+        validator = BankValidator(categories=[1], subjects={2: 1}, question_ids=[7])
+        question = normalize({"category_id": 1, "subject_id": 2, "content": "{x} + {y} = ?",
+                              "options": ["{x}", "甲"], "answers": [1], "variables": {"x": "randint(1, 9)"}})
+        self.assertInvalid(validator, question, "Undefined variable 'y'")
+
+        question.update(content="{x} = ?", answers=[3])
+        self.assertInvalid(validator, question, "Answer 3 does not match any option")
+
+        question.update(answers=[1], question_id=7)
+        self.assertInvalid(validator, question, "question_id 7 already exists")
+
+        question.update(question_id=8)
+        validator.validate(question)
+        self.assertInvalid(validator, question, "Duplicate question_id: 8")
+
+        question.update(question_id=None, subject_id=3)
+        self.assertInvalid(validator, question, "Unknown subject 3")
+
+    def test_reimport_skips_duplicates(self):
+        engine = self.use_database()
+        path = self.write_bank(".jsonl", self.JSONL.replace(', "question_id": 7', ""))
+
+        stats = BankImporter().run(read_records(path))
+        self.assertEqual((stats.categories, stats.subjects, stats.questions, stats.options), (1, 1, 2, 4))
+
+        # 重新匯入同一個檔案：類科、科目已存在，題目與選項相同的題目略過
+        stats = BankImporter().run(read_records(path))
+        self.assertEqual((stats.categories, stats.subjects, stats.questions, stats.skipped, stats.duplicates), (0, 0, 0, 2, 2))
+
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(select(func.count()).select_from(Question)).scalar(), 2)
+        self.assertEqual(QuestionBank.get_subject(category_id=1, subject_id=2).question_count, 2)
+
+
+class DedupeTests(SimpleTestCase):
+    """以 webhookEventId 略過 LINE 重送的事件"""
+
+    class FailingDeduplicator(EventDeduplicator):
+        def claim(self, event_id):
+            raise ConnectionError("cache unavailable")
+
+        def release(self, event_id):
+            raise ConnectionError("cache unavailable")
+
+    @staticmethod
+    def event(event_id="E1", redelivery=False):
+        return Event.from_dict({
+            "type": "postback", "mode": "active", "timestamp": 0, "replyToken": "token",
+            "source": {"type": "user", "userId": "U1"}, "postback": {"data": "data"},
+            "webhookEventId": event_id, "deliveryContext": {"isRedelivery": redelivery},
+        })
+
+    def handler(self, deduplicator, fail=False):
+        handler = LineWebhookHandler("secret", deduplicator=deduplicator)
+        handled = []
+
+        @handler.add(PostbackEvent)
+        def handle(event):
+            handled.append(event.webhook_event_id)
+            if fail:
+                raise RuntimeError("reply failed")
+
+        return handler, handled
+
+    def test_memory_deduplicator(self):
+        now = [0.0]
+        deduplicator = MemoryDeduplicator(maxsize=2, ttl=60)
+        deduplicator.events.timer = lambda: now[0]
+
+        self.assertTrue(deduplicator.claim("E1"))
+        self.assertFalse(deduplicator.claim("E1"))
+        deduplicator.release("E1")
+        self.assertTrue(deduplicator.claim("E1"))
+
+        # 超過 ttl 後視為新的事件
+        now[0] = 61
+        self.assertTrue(deduplicator.claim("E1"))
+
+    def test_skip_second_claim(self):
+        handler, handled = self.handler(MemoryDeduplicator())
+        handler.dispatch(self.event())
+        with self.assertLogs("line_bot", level="INFO") as logs:
+            handler.dispatch(self.event(redelivery=True))
+        handler.dispatch(self.event("E2"))
+        self.assertEqual(handled, ["E1", "E2"])
+        self.assertIn("Skip duplicate event E1 (redelivery=True)", logs.output[0])
+
+    def test_release_when_handler_raises(self):
+        deduplicator = MemoryDeduplicator()
+        handler, handled = self.handler(deduplicator, fail=True)
+        with self.assertRaises(RuntimeError):
+            handler.dispatch(self.event())
+        # 處理失敗的事件可再次處理
+        with self.assertRaises(RuntimeError):
+            handler.dispatch(self.event(redelivery=True))
+        self.assertEqual(handled, ["E1", "E1"])
+
+    def test_release_when_async_handler_raises(self):
+        deduplicator = MemoryDeduplicator()
+        handler = LineWebhookHandler("secret", deduplicator=deduplicator)
+
+        @handler.add(PostbackEvent)
+        async def handle(event):
+            raise RuntimeError("reply failed")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(handler.dispatch_async(self.event()))
+        self.assertTrue(deduplicator.claim("E1"))
+
+    def test_continue_when_backend_fails(self):
+        handler, handled = self.handler(self.FailingDeduplicator())
+        with self.assertLogs("line_bot", level="ERROR"):
+            handler.dispatch(self.event())
+            handler.dispatch(self.event())
+        self.assertEqual(handled, ["E1", "E1"])
+
+        # release 失敗時仍拋出處理函式的錯誤
+        handler, handled = self.handler(self.FailingDeduplicator(), fail=True)
+        with self.assertLogs("line_bot", level="ERROR"), self.assertRaises(RuntimeError):
+            handler.dispatch(self.event())
+
+
+class ThrottleTests(SimpleTestCase):
+    """每位使用者的限速與重複點擊合併"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.throttle = RequestThrottle(rate=2, burst=3, coalesce_window=1.5, notice_interval=10, timer=lambda: self.now)
+
+    def test_coalesce_identical_data(self):
+        self.assertIsNone(self.throttle.check("U1", "data"))
+        self.now = 1.0
+        self.assertEqual(self.throttle.check("U1", "data"), RequestThrottle.COALESCED)
+        # 其他使用者或不同 data 不受影響
+        self.assertIsNone(self.throttle.check("U2", "data"))
+        self.assertIsNone(self.throttle.check("U1", "other"))
+
+        self.now = 2.5
+        self.assertIsNone(self.throttle.check("U1", "data"))
+
+    def test_rate_limit_after_burst(self):
+        results = [self.throttle.check("U1", f"data{i}") for i in range(5)]
+        self.assertEqual(results, [None, None, None, RequestThrottle.RATE_LIMITED, RequestThrottle.RATE_LIMITED])
+        self.assertTrue(self.throttle.take("U2"))
+
+    def test_refill_after_interval(self):
+        for _ in range(3):
+            self.assertTrue(self.throttle.take("U1"))
+        self.assertFalse(self.throttle.take("U1"))
+
+        # 每 1 / rate 秒補充 1 個
+        self.now = 0.25
+        self.assertFalse(self.throttle.take("U1"))
+        self.now = 0.5
+        self.assertTrue(self.throttle.take("U1"))
+        self.assertFalse(self.throttle.take("U1"))
+
+        # 最多補充至 burst 個
+        self.now = 100
+        self.assertEqual([self.throttle.take("U1") for _ in range(4)], [True, True, True, False])
+
+    def test_notify_once_per_interval(self):
+        self.assertTrue(self.throttle.should_notify("U1"))
+        self.now = 9
+        self.assertFalse(self.throttle.should_notify("U1"))
+        self.now = 10
+        self.assertTrue(self.throttle.should_notify("U1"))
@@ -0,0 +1,124 @@
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+
+from typing import Optional, Tuple
+
+from linebot.v3.messaging import (
+    Configuration,
+    ApiClient,
+    AsyncApiClient,
+    MessagingApi,
+    AsyncMessagingApi,
+)
+
+
+def build_configuration(pool_size: int = None) -> Configuration:
+    # line_api_host 可指向本機替代伺服器 (測試、壓測用)
+    configuration = Configuration(
+        host=os.environ.get("line_api_host") or None,
+        access_token=os.environ.get("channel_access_token")
+    )
+    configuration.connection_pool_maxsize = pool_size or int(os.environ.get("line_api_pool_size", 10))
+    return configuration
+
+
+class SharedApiClient:
+    """整個程序共用的 Messaging API 用戶端，重複使用 keep-alive 連線"""
+
+    def __init__(self, configuration: Configuration):
+        self.configuration = configuration
+        self._lock = threading.Lock()
+        self._api_client: Optional[ApiClient] = None
+        self._messaging_api: Optional[MessagingApi] = None
+
+    def get(self) -> MessagingApi:
+        messaging_api = self._messaging_api
+        if messaging_api is not None:
+            return messaging_api
+
+        with self._lock:
+            if self._messaging_api is None:
+                self._api_client = ApiClient(self.configuration)
+                self._messaging_api = MessagingApi(self._api_client)
+            return self._messaging_api
+
+    def close(self) -> None:
+        with self._lock:
+            api_client, self._api_client, self._messaging_api = self._api_client, None, None
+
+        if api_client is not None:
+            api_client.close()
+            api_client.rest_client.pool_manager.clear()
+
+
+class SharedAsyncApiClient:
+    """
+    非同步 Messaging API 用戶端，aiohttp 連線池綁定事件迴圈，
+    因此每個事件迴圈各建立一個並共用
+    """
+
+    def __init__(self, configuration: Configuration):
+        self.configuration = configuration
+        self._clients = weakref.WeakKeyDictionary()
+
+    def get(self) -> AsyncMessagingApi:
+        loop = asyncio.get_running_loop()
+        client: Optional[Tuple[AsyncApiClient, AsyncMessagingApi]] = self._clients.get(loop)
+        if client is None:
+            api_client = AsyncApiClient(self.configuration)
+            client = self._clients[loop] = (api_client, AsyncMessagingApi(api_client))
+        return client[1]
+
+    async def close(self) -> None:
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client[0].close()
+
+
+async def lifespan(receive, send) -> None:
+    """
+    ASGI lifespan：Django 的 ASGI application 不處理 lifespan 事件，
+    由 question_bank.asgi 轉交至此，伺服器關閉時關閉事件迴圈上的用戶端
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_line_api.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def reply_message_raw(line_bot_api: MessagingApi, reply_message: dict):
+    """
+    直接以 dict 呼叫 reply API，略過 ReplyMessageRequest 的建構與驗證，
+    傳入 AsyncMessagingApi 時回傳 coroutine
+    """
+    return line_bot_api.api_client.call_api(
+        '/v2/bot/message/reply', 'POST',
+        header_params={
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        },
+        body=reply_message,
+        response_types_map={
+            '200': "ReplyMessageResponse",
+            '400': "ErrorResponse",
+            '429': "ErrorResponse",
+        },
+        auth_settings=['Bearer'],
+        _return_http_data_only=True
+    )
+
+
+configuration = build_configuration()
+
+line_api = SharedApiClient(configuration)
+atexit.register(line_api.close)
+
+# 非同步模式下同時進行中的請求數較多，連線池另外設定
+async_line_api = SharedAsyncApiClient(build_configuration(int(os.environ.get("line_api_async_pool_size", 100))))
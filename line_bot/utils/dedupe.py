@@ -0,0 +1,82 @@
+import os
+
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from django.core.cache import caches
+
+from question_bank.cache import CacheStats, TTLCache
+
+
+class EventDeduplicator(ABC):
+    """
+    以 webhookEventId 記錄已處理的事件，claim 回傳 False 表示重複 (LINE 重送)；
+    處理失敗時 release 取消紀錄，讓 LINE 重送的事件可以再次處理
+    """
+
+    @abstractmethod
+    def claim(self, event_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def release(self, event_id: str) -> None:
+        ...
+
+    async def aclaim(self, event_id: str) -> bool:
+        return self.claim(event_id)
+
+    async def arelease(self, event_id: str) -> None:
+        self.release(event_id)
+
+
+class MemoryDeduplicator(EventDeduplicator):
+    """單一程序內的去重，最多記錄 maxsize 個事件、各保留 ttl 秒"""
+
+    def __init__(self, maxsize: int = 65536, ttl: float = 3600):
+        self.events = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def claim(self, event_id: str) -> bool:
+        return self.events.add(event_id)
+
+    def release(self, event_id: str) -> None:
+        self.events.invalidate(event_id)
+
+    def stats(self) -> CacheStats:
+        return self.events.stats()
+
+
+class CacheDeduplicator(EventDeduplicator):
+    """以 Django 快取 (如 Redis、Memcached) 的 add 在多個程序間共用去重紀錄"""
+
+    key_prefix = "line_bot:event:"
+
+    def __init__(self, alias: str = "default", ttl: float = 3600):
+        self.alias = alias
+        self.ttl = ttl
+
+    def claim(self, event_id: str) -> bool:
+        return caches[self.alias].add(self.key_prefix + event_id, 1, timeout=self.ttl)
+
+    async def aclaim(self, event_id: str) -> bool:
+        return await caches[self.alias].aadd(self.key_prefix + event_id, 1, timeout=self.ttl)
+
+    def release(self, event_id: str) -> None:
+        caches[self.alias].delete(self.key_prefix + event_id)
+
+    async def arelease(self, event_id: str) -> None:
+        await caches[self.alias].adelete(self.key_prefix + event_id)
+
+
+def build_deduplicator() -> Optional[EventDeduplicator]:
+    # memory: 單一程序 / cache: Django 快取 (line_dedupe_cache 指定 CACHES 名稱) / off: 不去重
+    backend = os.environ.get("line_dedupe_backend", "memory")
+    ttl = float(os.environ.get("line_dedupe_ttl", 3600))
+
+    if backend == "memory":
+        return MemoryDeduplicator(maxsize=int(os.environ.get("line_dedupe_size", 65536)), ttl=ttl)
+    elif backend == "cache":
+        return CacheDeduplicator(alias=os.environ.get("line_dedupe_cache", "default"), ttl=ttl)
+    elif backend == "off":
+        return None
+    else:
+        raise ValueError(f"Unknown dedupe backend: {backend}")
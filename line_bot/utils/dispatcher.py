@@ -0,0 +1,321 @@
+import asyncio
+import inspect
+import json
+import logging
+import queue
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from linebot.v3 import WebhookHandler
+from linebot.v3.exceptions import InvalidSignatureError
+from linebot.v3.models.events import UnknownEvent
+from linebot.v3.webhook import WebhookPayload
+from linebot.v3.webhooks import Event, MessageEvent
+
+from line_bot.utils.dedupe import EventDeduplicator
+from question_bank.metrics import duplicate_events_total, payload_events, span
+
+
+logger = logging.getLogger('line_bot')
+
+
+def event_source_key(event: Event) -> Optional[str]:
+    source = getattr(event, "source", None)
+    if source is None:
+        return None
+    return getattr(source, "user_id", None) or getattr(source, "group_id", None) or getattr(source, "room_id", None)
+
+
+def group_by_source(events: List[Event]) -> List[List[Event]]:
+    """依事件來源分組，保留各來源內的事件順序"""
+    groups: Dict[Optional[str], List[Event]] = {}
+    for event in events:
+        groups.setdefault(event_source_key(event), []).append(event)
+    return list(groups.values())
+
+
+class LineWebhookHandler(WebhookHandler):
+    """
+    可單獨分派事件的 WebhookHandler，供背景佇列重複使用；
+    concurrency > 1 時同一個 webhook 內不同來源的事件以執行緒池同時處理
+    """
+
+    def __init__(self, channel_secret, concurrency: int = 1, deduplicator: Optional[EventDeduplicator] = None):
+        super().__init__(channel_secret)
+        self.concurrency = concurrency
+        # 略過 LINE 重送 (webhookEventId 已處理過) 的事件
+        self.deduplicator = deduplicator
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="line-bot-payload")
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def find_handler(self, event: Event) -> Optional[Callable]:
+        func = None
+
+        if isinstance(event, MessageEvent):
+            func = self._handlers.get(event.__class__.__name__ + '_' + event.message.__class__.__name__)
+
+        if func is None:
+            func = self._handlers.get(event.__class__.__name__)
+
+        if func is None:
+            func = self._default
+
+        return func
+
+    @staticmethod
+    def handler_args(func: Callable, event: Event, destination: Optional[str]) -> tuple:
+        arg_spec = inspect.getfullargspec(func)
+        if arg_spec.varargs is not None or len(arg_spec.args) == 2:
+            return event, destination
+        elif len(arg_spec.args) == 1:
+            return event,
+        else:
+            return ()
+
+    @staticmethod
+    def _duplicate(event: Event, claimed: bool) -> bool:
+        if claimed:
+            return False
+        delivery_context = getattr(event, "delivery_context", None)
+        redelivery = bool(delivery_context and delivery_context.is_redelivery)
+        duplicate_events_total.inc(redelivery=str(redelivery).lower())
+        logger.info("Skip duplicate event %s (redelivery=%s)", event.webhook_event_id, redelivery)
+        return True
+
+    def is_duplicate(self, event: Event) -> bool:
+        event_id = getattr(event, "webhook_event_id", None)
+        if self.deduplicator is None or not event_id:
+            return False
+        try:
+            claimed = self.deduplicator.claim(event_id)
+        except Exception:
+            # 去重紀錄無法使用時照常處理
+            logger.exception("Failed to check duplicate event %s", event_id)
+            return False
+        return self._duplicate(event, claimed)
+
+    async def is_duplicate_async(self, event: Event) -> bool:
+        event_id = getattr(event, "webhook_event_id", None)
+        if self.deduplicator is None or not event_id:
+            return False
+        try:
+            claimed = await self.deduplicator.aclaim(event_id)
+        except Exception:
+            logger.exception("Failed to check duplicate event %s", event_id)
+            return False
+        return self._duplicate(event, claimed)
+
+    def release(self, event: Event) -> None:
+        # 處理失敗 (例如 reply 失敗) 時取消去重紀錄，LINE 重送時可再次處理
+        event_id = getattr(event, "webhook_event_id", None)
+        if self.deduplicator is None or not event_id:
+            return
+        try:
+            self.deduplicator.release(event_id)
+        except Exception:
+            logger.exception("Failed to release duplicate event %s", event_id)
+
+    async def release_async(self, event: Event) -> None:
+        event_id = getattr(event, "webhook_event_id", None)
+        if self.deduplicator is None or not event_id:
+            return
+        try:
+            await self.deduplicator.arelease(event_id)
+        except Exception:
+            logger.exception("Failed to release duplicate event %s", event_id)
+
+    def dispatch(self, event: Event, destination: Optional[str] = None) -> None:
+        if self.is_duplicate(event):
+            return
+
+        func = self.find_handler(event)
+        if func is None:
+            logger.info("No handler of %s and no default handler", event.__class__.__name__)
+            return
+
+        try:
+            with span("handle"):
+                func(*self.handler_args(func, event, destination))
+        except BaseException:
+            self.release(event)
+            raise
+
+    async def dispatch_async(self, event: Event, destination: Optional[str] = None) -> None:
+        """分派事件給 async def 的處理函式"""
+        if await self.is_duplicate_async(event):
+            return
+
+        func = self.find_handler(event)
+        if func is None:
+            logger.info("No handler of %s and no default handler", event.__class__.__name__)
+            return
+
+        try:
+            with span("handle"):
+                await func(*self.handler_args(func, event, destination))
+        except BaseException:
+            await self.release_async(event)
+            raise
+
+    def parse(self, body: str, signature: str) -> WebhookPayload:
+        # 與 WebhookParser.parse 相同，分開計時簽章驗證與事件解析
+        with span("verify"):
+            if not self.parser.signature_validator.validate(body, signature):
+                raise InvalidSignatureError('Invalid signature. signature=' + signature)
+
+        with span("parse"):
+            body_json = json.loads(body)
+            events = []
+            for event in body_json['events']:
+                try:
+                    events.append(Event.from_dict(event))
+                except ValueError:
+                    logger.info('Unknown event type. type=' + event['type'])
+                    events.append(UnknownEvent.new_from_json_dict(event))
+
+        return WebhookPayload(events=events, destination=body_json.get('destination'))
+
+    def dispatch_all(self, events: List[Event], destination: Optional[str] = None) -> None:
+        for event in events:
+            self.dispatch(event, destination)
+
+    def handle(self, body, signature):
+        payload = self.parse(body, signature)
+        payload_events.observe(len(payload.events))
+
+        with span("payload"):
+            groups = group_by_source(payload.events)
+            if self.concurrency <= 1 or len(groups) <= 1:
+                self.dispatch_all(payload.events, payload.destination)
+                return
+
+            # 不同來源同時處理，同一來源依序處理
+            futures = [self.executor().submit(self.dispatch_all, events, payload.destination) for events in groups]
+            wait(futures)
+            # 全部處理完後才拋出第一個錯誤，與依序處理時相同
+            for future in futures:
+                future.result()
+
+    async def handle_async(self, payload: WebhookPayload) -> None:
+        payload_events.observe(len(payload.events))
+
+        async def run(events: List[Event]) -> None:
+            for event in events:
+                await self.dispatch_async(event, payload.destination)
+
+        with span("payload"):
+            # 不同來源的事件同時處理，同一來源的事件依序處理
+            await asyncio.gather(*(run(events) for events in group_by_source(payload.events)))
+
+
+class EventDispatcher:
+    """背景事件處理池，依事件來源分配工作執行緒，確保同一使用者的事件依序處理"""
+
+    _STOP = object()
+
+    def __init__(self, handle: Callable[[Event, Optional[str]], None], workers: int = 4, queue_size: int = 256):
+        if workers <= 0:
+            raise ValueError(f"workers must be positive: {workers}")
+        self.handle = handle
+        self.workers = workers
+        self.queue_size = queue_size
+
+        self._queues: List[queue.Queue] = []
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._queues = [queue.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+            for index, event_queue in enumerate(self._queues):
+                thread = threading.Thread(
+                    target=self._run, args=(event_queue,), name=f"line-bot-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, event: Event, destination: Optional[str] = None) -> bool:
+        self.start()
+
+        # 同一來源固定進入同一條佇列
+        event_queue = self._queues[hash(event_source_key(event)) % self.workers]
+        try:
+            event_queue.put_nowait((event, destination))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning("Line event queue is full, dropping %s from %s",
+                           event.__class__.__name__, event_source_key(event))
+            return False
+
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _run(self, event_queue: queue.Queue) -> None:
+        while True:
+            item = event_queue.get()
+            try:
+                if item is self._STOP:
+                    return
+                event, destination = item
+                try:
+                    self.handle(event, destination)
+                except Exception as ex:
+                    with self._lock:
+                        self.failed += 1
+                    logger.exception("Handling queued Line event failed: %s", ex)
+                else:
+                    with self._lock:
+                        self.processed += 1
+            finally:
+                event_queue.task_done()
+
+    def queue_depth(self) -> int:
+        return sum(event_queue.qsize() for event_queue in self._queues)
+
+    def join(self) -> None:
+        for event_queue in list(self._queues):
+            event_queue.join()
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            queues, threads = self._queues, self._threads
+            self._queues, self._threads = [], []
+
+        for event_queue in queues:
+            event_queue.put(self._STOP)
+        for thread in threads:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": self.queue_depth(),
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "processed": self.processed,
+                "failed": self.failed,
+            }
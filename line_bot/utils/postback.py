@@ -1,8 +1,13 @@
+import bisect
+import codecs
+import functools
 import itertools
+import sys
 
+from array import array
 from enum import Enum
 from dataclasses import dataclass
-from typing import Any, Callable, Union
+from typing import Any, Callable, List, Tuple, Union
 
 
 class QuestionPostback:
@@ -22,32 +27,166 @@ class QuestionPostback:
 
 
     class ReplyAnswer:
-        chr_range  = range(int("4E00", 16), int("9FFF", 16))  # 20,992 character
-        encode_map = {"".join(k): chr(v) for k, v in zip(itertools.product(*["ABCDE*-"]*5), chr_range)}
-        decode_map = {chr(k): "".join(v) for k, v in zip(chr_range, itertools.product(*["ABCDE*-"]*5))}
+        """
+        作答紀錄編碼：每題為 "ABCDE*" 其中一個符號 (* 表示答對)
+
+        以 6 進位整數打包，每 11 題編成 2 個字元 (6**11 <= 21760**2)，
+        最後一組以長度偏移編碼，1~5 題時只佔 1 個字元。
+        字元取自不與舊格式重疊的區段，舊格式 (每字元 5 題) 仍可解碼。
+        """
+
+        symbols = "ABCDE*"
+        chunk_size = 11
+
+        # 符號轉為 6 進位數字 / 用於檢查是否含有非法符號
+        digit_table = str.maketrans(symbols, "012345")
+        symbol_table = str.maketrans("", "", symbols)
+
+        # 新格式使用的字元區段 (起點, 數量)，皆以 256 字元為單位，共 21,760 個字元
+        char_ranges = (
+            (0x3400, 0x4E00 - 0x3400),  # CJK 擴充 A、易經卦象
+            (0x9000, 0xA000 - 0x9000),  # CJK 基本區中舊格式未使用的部分
+            (0xAC00, 0xD700 - 0xAC00),  # 韓文音節
+        )
+
+        # 字元編號 = 區塊序號 * 256 + 字元碼的低位元組，
+        # 區塊序號與字元碼高位元組的轉換以 bytes.translate 對 UTF-16 的高位元組一次完成
+        blocks = bytes(block for start, size in char_ranges for block in range(start >> 8, (start + size) >> 8))
+        block_table = blocks.ljust(256, b"\x00")
+        code_table = bytes(block & 0xFF for block in map(blocks.find, range(256)))  # 不屬於任何區段時為 0xFF
+        radix = len(blocks) * 256
+
+        # 以機器位元組順序的 UTF-16 與 array("H") 互轉 (直接呼叫 codecs 函式，省去編碼名稱查詢)
+        if sys.byteorder == "little":
+            utf16_encode, utf16_decode, high_bytes = codecs.utf_16_le_encode, codecs.utf_16_le_decode, slice(1, None, 2)
+        else:
+            utf16_encode, utf16_decode, high_bytes = codecs.utf_16_be_encode, codecs.utf_16_be_decode, slice(0, None, 2)
+
+        # 舊格式：U+4E00 ~ U+8FA6 每字元 5 題，符號含補位用的 "-"
+        legacy_symbols = "ABCDE*-"
+        legacy_start = 0x4E00
+        legacy_size = 7 ** 5
+
+        # 長度為 m 的最後一組從 length_offsets[m] 開始編號
+        length_offsets = tuple(sum(6 ** k for k in range(1, m)) for m in range(chunk_size + 1))
+
+        @staticmethod
+        @functools.cache
+        def _digit_groups() -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+            """11 題拆成 3 + 4 + 4 題查表，第一次解碼時才建立 (216、1,296 筆)"""
+            groups = tuple("".join(digits) for digits in itertools.product(QuestionPostback.ReplyAnswer.symbols, repeat=4))
+            return tuple(group[1:] for group in groups[:216]), groups
+
+        @staticmethod
+        def _to_indices(string: str) -> array:
+            cls = QuestionPostback.ReplyAnswer
+            data = bytearray(cls.utf16_encode(string)[0])
+            blocks = data[cls.high_bytes].translate(cls.code_table)
+            # 區段外的字元 (含 BMP 以外字元的代理對) 對應到 0xFF
+            if 0xFF in blocks:
+                raise ValueError(f"Invalid character: {string}")
+            data[cls.high_bytes] = blocks
+            return array("H", data)
+
+        @staticmethod
+        def _from_indices(indices: List[int]) -> str:
+            cls = QuestionPostback.ReplyAnswer
+            data = bytearray(array("H", indices).tobytes())
+            data[cls.high_bytes] = data[cls.high_bytes].translate(cls.block_table)
+            return cls.utf16_decode(data)[0]
+
+        @staticmethod
+        def _to_char(index: int) -> str:
+            cls = QuestionPostback.ReplyAnswer
+            if not 0 <= index < cls.radix:
+                raise ValueError(f"Index out of range: {index}")
+            return chr(cls.blocks[index >> 8] << 8 | index & 0xFF)
+
+        @staticmethod
+        def _from_char(char: str) -> int:
+            cls = QuestionPostback.ReplyAnswer
+            code = ord(char)
+            block = cls.code_table[code >> 8] if code <= 0xFFFF else 0xFF
+            if block == 0xFF:
+                raise ValueError(f"Invalid character: {char}")
+            return block << 8 | code & 0xFF
 
         @staticmethod
         def encode(string: str) -> str:
-            result = ""
-            for i in range(0, len(string), 5):
-                s = string[i: 5+i]
-                if len(s) < 5:
-                    s += "-" * ((5 - len(string)) % 5)
-                try:
-                    result += QuestionPostback.ReplyAnswer.encode_map[s]
-                except KeyError:
-                    raise ValueError(f"Invalid segment: {s}")
-            return result
+            cls = QuestionPostback.ReplyAnswer
+            if not string:
+                return ""
+            if string.translate(cls.symbol_table):
+                raise ValueError(f"Invalid segment: {string}")
+
+            full_chunks, remainder = divmod(len(string), cls.chunk_size)
+            if remainder == 0:
+                full_chunks, remainder = full_chunks - 1, cls.chunk_size
+
+            digits = string.translate(cls.digit_table)
+            body = full_chunks * cls.chunk_size
+            radix = cls.radix
+            indices = [index for i in range(0, body, cls.chunk_size) for index in divmod(int(digits[i: i + cls.chunk_size], 6), radix)]
+
+            # 最後一組帶長度資訊
+            value = cls.length_offsets[remainder] + int(digits[body:], 6)
+            if remainder > 5:
+                indices.extend(divmod(value, radix))
+            else:
+                indices.append(value)
+
+            if len(indices) > 2:
+                return cls._from_indices(indices)
+            return "".join([cls._to_char(index) for index in indices])
 
         @staticmethod
         def decode(string: str) -> str:
-            result = ""
-            for s in string:
+            cls = QuestionPostback.ReplyAnswer
+            if not string:
+                return ""
+
+            if cls.legacy_start <= ord(string[0]) < cls.legacy_start + cls.legacy_size:
+                return cls.decode_legacy(string)
+
+            radix = cls.radix
+            high, groups = cls._digit_groups()
+
+            # 字元數為奇數時最後一組只有 1 個字元
+            tail = 1 if len(string) % 2 else 2
+            if len(string) > 2:
+                indices = cls._to_indices(string)
+                body = len(indices) - tail
                 try:
-                    result += QuestionPostback.ReplyAnswer.decode_map[s]
-                except KeyError:
+                    # 6**11 以上的值 (// 6**8 >= 216) 查表時超出 high 的範圍
+                    result = [high[(value := h * radix + l) // 6 ** 8] + groups[value // 6 ** 4 % 6 ** 4] + groups[value % 6 ** 4]
+                              for h, l in zip(indices[0:body:2], indices[1:body:2])]
+                except IndexError:
+                    raise ValueError(f"Invalid character: {string}") from None
+                value = indices[-1] if tail == 1 else indices[-2] * radix + indices[-1]
+            else:
+                # 只有最後一組時逐字轉換，省去 UTF-16 轉換的固定成本
+                result = []
+                value = cls._from_char(string[0]) if tail == 1 else cls._from_char(string[0]) * radix + cls._from_char(string[1])
+
+            length = bisect.bisect_right(cls.length_offsets, value) - 1
+            value -= cls.length_offsets[length]
+            if value >= 6 ** length or (tail == 1 and length > 5):
+                raise ValueError(f"Invalid character: {string[-tail:]}")
+            result.append((high[value // 6 ** 8] + groups[value // 6 ** 4 % 6 ** 4] + groups[value % 6 ** 4])[-length:])
+
+            return "".join(result)
+
+        @staticmethod
+        def decode_legacy(string: str) -> str:
+            cls = QuestionPostback.ReplyAnswer
+            result = []
+            for s in string:
+                value = ord(s) - cls.legacy_start
+                if not 0 <= value < cls.legacy_size:
                     raise ValueError(f"Invalid character: {s}")
-            return result.replace("-", "")
+                for power in (2401, 343, 49, 7, 1):
+                    result.append(cls.legacy_symbols[value // power % 7])
+            return "".join(result).replace("-", "")
         
         @staticmethod
         def count_correct_answers(string: str, decode: bool = False) -> int:
@@ -0,0 +1,75 @@
+import asyncio
+import os
+
+from typing import Callable, Dict, Optional, Tuple
+
+from linebot.v3.messaging import AsyncMessagingApi, MessagingApi, UserProfileResponse
+
+from question_bank.cache import TTLCache
+
+
+# eager: 處理事件前先取得使用者資料 / lazy: 實際用到時才向 LINE 取得
+profile_mode = os.environ.get("line_profile_mode", "eager")
+
+profile_cache = TTLCache(
+    maxsize=int(os.environ.get("line_profile_cache_size", 1024)),
+    ttl=float(os.environ.get("line_profile_cache_ttl", 600))
+)
+
+
+# 非同步模式下進行中的查詢，同一使用者只送出一個請求
+_pending: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+
+
+class LazyProfile:
+    """延遲載入的使用者資料，屬性存取時才取得 UserProfileResponse"""
+
+    def __init__(self, user_id: str, fetch: Callable[[], UserProfileResponse]):
+        self.user_id = user_id
+        self._fetch = fetch
+        self._profile: Optional[UserProfileResponse] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._profile is not None
+
+    @property
+    def profile(self) -> UserProfileResponse:
+        if self._profile is None:
+            self._profile = self._fetch()
+        return self._profile
+
+    def __getattr__(self, name):
+        return getattr(self.profile, name)
+
+
+def get_profile(line_bot_api: MessagingApi, user_id: str, lazy: Optional[bool] = None):
+    def fetch():
+        return profile_cache.get_or_set(user_id, lambda: line_bot_api.get_profile(user_id))
+
+    if lazy is None:
+        lazy = profile_mode == "lazy"
+
+    if lazy:
+        return LazyProfile(user_id, fetch)
+    return fetch()
+
+
+async def get_profile_async(line_bot_api: AsyncMessagingApi, user_id: str) -> UserProfileResponse:
+    """與 get_profile 共用快取的非同步版本"""
+    profile = profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+
+    key = (asyncio.get_running_loop(), user_id)
+    pending = _pending.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    pending = _pending[key] = asyncio.ensure_future(line_bot_api.get_profile(user_id))
+    try:
+        profile = await asyncio.shield(pending)
+        profile_cache.set(user_id, profile)
+        return profile
+    finally:
+        _pending.pop(key, None)
@@ -0,0 +1,77 @@
+import os
+
+from typing import Callable, Dict, Type
+
+from linebot.v3.messaging.models import (
+    PostbackAction,
+    FlexText,
+    FlexBubble,
+    FlexBox,
+    FlexImage,
+    FlexFiller,
+    FlexBoxLinearGradient,
+    FlexMessage,
+    FlexCarousel,
+    ReplyMessageRequest,
+    TextMessage,
+    StickerMessage
+)
+
+from line_bot.utils.client import reply_message_raw
+from line_bot.utils.template import Template
+from line_bot.utils.template_builder import TemplateBuilder
+
+
+# 送出前以 pydantic 模型驗證 dict 內容，僅供除錯、測試使用
+flex_validate = os.environ.get("line_flex_validate", "false").lower() in ("1", "true", "yes")
+
+
+def flex_dict(model: Type) -> Callable[..., Dict]:
+    """
+    產生與 model(**kwargs).to_dict() 相同結果的 dict 建構函式，
+    欄位名稱轉為 API 使用的別名，並補上模型的預設值 (type 等)
+    """
+    aliases = {name: field.alias for name, field in model.__fields__.items()}
+    defaults = {field.alias: field.default for field in model.__fields__.values() if field.default is not None}
+
+    def build(**kwargs) -> Dict:
+        node = dict(defaults)
+        for name, value in kwargs.items():
+            if value is not None:
+                node[aliases[name]] = value
+        return node
+
+    build.model = model
+    return build
+
+
+class RawTemplate(Template):
+    PostbackAction = flex_dict(PostbackAction)
+    FlexText = flex_dict(FlexText)
+    FlexBubble = flex_dict(FlexBubble)
+    FlexBox = flex_dict(FlexBox)
+    FlexImage = flex_dict(FlexImage)
+    FlexFiller = flex_dict(FlexFiller)
+    FlexBoxLinearGradient = flex_dict(FlexBoxLinearGradient)
+
+
+class RawTemplateBuilder(TemplateBuilder):
+    template = RawTemplate
+    FlexMessage = flex_dict(FlexMessage)
+    FlexCarousel = flex_dict(FlexCarousel)
+    ReplyMessageRequest = flex_dict(ReplyMessageRequest)
+    TextMessage = flex_dict(TextMessage)
+    StickerMessage = flex_dict(StickerMessage)
+
+    @classmethod
+    def reply_request(cls, reply_token: str, messages: list) -> Dict:
+        reply_message = cls.ReplyMessageRequest(
+            reply_token=reply_token,
+            messages=messages
+        )
+        if flex_validate:
+            # 驗證失敗時拋出 pydantic.ValidationError
+            ReplyMessageRequest.from_dict(reply_message)
+        return reply_message
+
+    post_reply = staticmethod(reply_message_raw)
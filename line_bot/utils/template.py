@@ -13,16 +13,29 @@ from linebot.v3.messaging.models import (
 )
 
 from line_bot.utils.postback import QuestionPostback
-from question_bank.models import (
-    Question, Subject, Category, QuestionOption
-)
+from question_bank.catalog import CategoryRecord, SubjectRecord
+from question_bank.deck import QuestionCard, OptionCard
 
 
 class Template:
+    # 節點建構函式，子類別可替換為其他實作 (例如直接產生 dict)
+    PostbackAction = PostbackAction
+    FlexText = FlexText
+    FlexBubble = FlexBubble
+    FlexBox = FlexBox
+    FlexImage = FlexImage
+    FlexFiller = FlexFiller
+    FlexBoxLinearGradient = FlexBoxLinearGradient
 
     @staticmethod
-    def tag_bar(*tags) -> FlexBox:
-        tag_box = FlexBox(
+    def background(background_image: str, seed: int) -> str:
+        """依亂數種子選擇背景圖片，相同 postback 產生的訊息完全相同"""
+        images = background_image.split(";")
+        return images[seed % len(images)]
+
+    @classmethod
+    def tag_bar(cls, *tags) -> FlexBox:
+        tag_box = cls.FlexBox(
             layout="horizontal",
             position="absolute",
             spacing="5px",
@@ -33,13 +46,13 @@ class Template:
             offset_start="5%",
             offset_top="2%",
             contents=[
-                FlexBox(
+                cls.FlexBox(
                     layout="vertical",
                     background_color="#ff334b",
                     corner_radius="5px",
                     align_items="center",
                     contents=[
-                        FlexText(
+                        cls.FlexText(
                             text=tag,
                             size="xs",
                             color="#ffffff",
@@ -52,38 +65,38 @@ class Template:
         )
         return tag_box
 
-    @staticmethod
-    def category_bubble(category: Category) -> FlexBubble:
-        bubble = FlexBubble(
-            body=FlexBox(
+    @classmethod
+    def category_bubble(cls, category: CategoryRecord, background_image: str = None) -> FlexBubble:
+        bubble = cls.FlexBubble(
+            body=cls.FlexBox(
                 padding_all="0px",
                 layout="vertical",
                 contents=[
-                    FlexImage(
-                        url=random.choice(category.background_image.split(";")),
+                    cls.FlexImage(
+                        url=background_image or random.choice(category.background_image.split(";")),
                         gravity="center",
                         size="full",
                         aspect_ratio="1:1",
                         aspect_mode="cover",
                     ),
-                    FlexBox(
+                    cls.FlexBox(
                         layout="vertical",
                         position="absolute",
                         width="100%",
                         height="100%",
-                        background=FlexBoxLinearGradient(
+                        background=cls.FlexBoxLinearGradient(
                             angle="0deg",
                             start_color="#00000099",
                             end_color="#00000000",
                         ),
                         contents=[],
-                        action=PostbackAction(
+                        action=cls.PostbackAction(
                             text=category.name,
                             data=QuestionPostback.initialize(
                                 flag=1, category_id=category.category_id)
                         )
                     ),
-                    FlexBox(
+                    cls.FlexBox(
                         layout="horizontal",
                         position="absolute",
                         padding_all="20px",
@@ -91,7 +104,7 @@ class Template:
                         offset_start="0px",
                         offset_bottom="0px",
                         contents=[
-                            FlexText(
+                            cls.FlexText(
                                 text=category.name,
                                 color="#EEEEEE",
                                 size="xxl"
@@ -103,22 +116,22 @@ class Template:
         )
         return bubble
 
-    @staticmethod
-    def subject_bubble(subject: Subject, postback: QuestionPostback) -> FlexBubble:
-        bubble = FlexBubble(
-            body=FlexBox(
+    @classmethod
+    def subject_bubble(cls, subject: SubjectRecord, postback: QuestionPostback, background_image: str = None) -> FlexBubble:
+        bubble = cls.FlexBubble(
+            body=cls.FlexBox(
                 layout='vertical',
                 padding_all="0px",
                 contents=[
-                    FlexImage(
-                        url=random.choice(subject.background_image.split(";")),
+                    cls.FlexImage(
+                        url=background_image or random.choice(subject.background_image.split(";")),
                         gravity="top",
                         size="full",
                         aspect_ratio="2:3",
                         aspect_mode="cover"
                     ),
                     # 背景暗化層
-                    FlexBox(
+                    cls.FlexBox(
                         layout='vertical',
                         position="absolute",
                         background_color="#2D2D2DAA",
@@ -128,14 +141,14 @@ class Template:
                         offset_end="0px",
                         padding_top="60px",
                         contents=[
-                            Template.tag_bar(subject.name),
+                            cls.tag_bar(subject.name),
                             # 章節
-                            FlexBox(
+                            cls.FlexBox(
                                 layout="vertical",
                                 padding_start="5%",
                                 padding_end="10%",
                                 contents=[
-                                    FlexText(
+                                    cls.FlexText(
                                         text=subject.name,
                                         size="3xl",
                                         color="#ffffff",
@@ -145,24 +158,24 @@ class Template:
                                 ]
                             ),
                             # 敘述
-                            FlexBox(
+                            cls.FlexBox(
                                 layout="vertical",
                                 margin="xxl",
                                 padding_start="10%",
                                 padding_end="10%",
                                 contents=[
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="horizontal",
                                         spacing="lg",
                                         margin="xl",
                                         corner_radius="30px",
                                         contents=[
-                                            FlexBox(
+                                            cls.FlexBox(
                                                 layout="vertical",
                                                 flex=0,
                                                 contents=[
-                                                    FlexFiller(),
-                                                    FlexBox(
+                                                    cls.FlexFiller(),
+                                                    cls.FlexBox(
                                                         layout="vertical",
                                                         width="14px",
                                                         height="14px",
@@ -170,13 +183,13 @@ class Template:
                                                         border_color="#ffffffcc",
                                                         corner_radius="30px",
                                                         contents=[
-                                                            FlexFiller()
+                                                            cls.FlexFiller()
                                                         ]
                                                     ),
-                                                    FlexFiller()
+                                                    cls.FlexFiller()
                                                 ]
                                             ),
-                                            FlexText(
+                                            cls.FlexText(
                                                 flex=4,
                                                 text=desc,
                                                 size="lg",
@@ -189,14 +202,14 @@ class Template:
                             ),
                         ]
                     ),
-                    FlexBox(
+                    cls.FlexBox(
                         layout="horizontal",
                         position="absolute",
                         offset_bottom="15px",
                         offset_start="5%",
                         offset_end="5%",
                         contents=[
-                            FlexBox(
+                            cls.FlexBox(
                                 layout='vertical',
                                 height="40px",
                                 border_width="1px",
@@ -204,16 +217,16 @@ class Template:
                                 corner_radius="7px",
                                 width="90%",
                                 contents=[
-                                    FlexFiller(),
-                                    FlexBox(
+                                    cls.FlexFiller(),
+                                    cls.FlexBox(
                                         layout="baseline",
                                         spacing="sm",
                                         contents=[
-                                            FlexText(
-                                                text=f"共 {len(subject.questions)} 題",
+                                            cls.FlexText(
+                                                text=f"共 {subject.question_count} 題",
                                                 color="#ffffff",
                                                 align="center",
-                                                action=PostbackAction(
+                                                action=cls.PostbackAction(
                                                     label="Test",
                                                     data=postback.configure(
                                                         flag=2,
@@ -223,7 +236,7 @@ class Template:
                                             )
                                         ]
                                     ),
-                                    FlexFiller()
+                                    cls.FlexFiller()
                                 ]
                             )
                         ]
@@ -233,15 +246,15 @@ class Template:
         )
         return bubble
 
-    @staticmethod
-    def mode_bubble(subject: Subject, postback: QuestionPostback) -> FlexBubble:
-        bubble = FlexBubble(
-            body=FlexBox(
+    @classmethod
+    def mode_bubble(cls, subject: SubjectRecord, postback: QuestionPostback) -> FlexBubble:
+        bubble = cls.FlexBubble(
+            body=cls.FlexBox(
                 layout='vertical',
                 padding_all="0px",
                 height="200px",
                 contents=[
-                    FlexImage(
+                    cls.FlexImage(
                         url=random.choice(subject.background_image.split(";")),
                         gravity="top",
                         size="full",
@@ -249,7 +262,7 @@ class Template:
                         aspect_mode="cover"
                     ),
                     # 背景暗化層
-                    FlexBox(
+                    cls.FlexBox(
                         layout='vertical',
                         position="absolute",
                         background_color="#2D2D2DAA",
@@ -260,14 +273,14 @@ class Template:
                         padding_all="20px",
                         padding_top="135px",
                         contents=[
-                            FlexBox(
+                            cls.FlexBox(
                                 layout="horizontal",
                                 position="absolute",
                                 offset_bottom="15px",
                                 offset_start="15px",
                                 offset_end="15px",
                                 contents=[
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="vertical",
                                         spacing="sm",
                                         # margin = "xxl",
@@ -276,17 +289,17 @@ class Template:
                                         border_color="#ffffff",
                                         corner_radius="4px",
                                         contents=[
-                                            FlexFiller(),
-                                            FlexBox(
+                                            cls.FlexFiller(),
+                                            cls.FlexBox(
                                                 layout="baseline",
                                                 spacing="sm",
                                                 contents=[
-                                                    FlexFiller(),
-                                                    FlexText(
+                                                    cls.FlexFiller(),
+                                                    cls.FlexText(
                                                         text="複習",
                                                         color="#ffffff",
                                                         offset_top="-2px",
-                                                        action=PostbackAction(
+                                                        action=cls.PostbackAction(
                                                             data=postback.configure(
                                                                 flag=3,
                                                                 mode=QuestionPostback.QuestionModeType.REVISE,
@@ -294,13 +307,13 @@ class Template:
                                                             )
                                                         )
                                                     ),
-                                                    FlexFiller()
+                                                    cls.FlexFiller()
                                                 ]
                                             ),
-                                            FlexFiller()
+                                            cls.FlexFiller()
                                         ]
                                     ),
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="vertical",
                                         spacing="sm",
                                         margin="xl",
@@ -309,17 +322,17 @@ class Template:
                                         border_color="#ffffff",
                                         corner_radius="4px",
                                         contents=[
-                                            FlexFiller(),
-                                            FlexBox(
+                                            cls.FlexFiller(),
+                                            cls.FlexBox(
                                                 layout="baseline",
                                                 spacing="sm",
                                                 contents=[
-                                                    FlexFiller(),
-                                                    FlexText(
+                                                    cls.FlexFiller(),
+                                                    cls.FlexText(
                                                         text="測驗",
                                                         color="#ffffff",
                                                         offset_top="-2px",
-                                                        action=PostbackAction(
+                                                        action=cls.PostbackAction(
                                                             data=postback.configure(
                                                                 flag=3,
                                                                 mode=QuestionPostback.QuestionModeType.TEST,
@@ -327,26 +340,26 @@ class Template:
                                                             )
                                                         )
                                                     ),
-                                                    FlexFiller()
+                                                    cls.FlexFiller()
                                                 ]
                                             ),
-                                            FlexFiller()
+                                            cls.FlexFiller()
                                         ]
                                     )
                                 ]
                             )
                         ]
                     ),
-                    Template.tag_bar(subject.category.name, subject.name),
+                    cls.tag_bar(subject.category.name, subject.name),
                     # 顯示題數
-                    FlexBox(
+                    cls.FlexBox(
                         layout="vertical",
                         position="absolute",
                         offset_top="30%",
                         offset_start="18px",
                         contents=[
-                            FlexText(
-                                text=f"{len(subject.questions)}題",
+                            cls.FlexText(
+                                text=f"{subject.question_count}題",
                                 size="4xl",
                                 color="#ffffff",
                                 align="center"
@@ -358,16 +371,75 @@ class Template:
         )
         return bubble
 
-    @staticmethod
-    def question_bubble(question: Question, postback: QuestionPostback)-> FlexBubble:
+    @classmethod
+    def question_sections(cls, question: QuestionCard, postback: QuestionPostback) -> tuple:
+        """題目訊息中與作答紀錄無關的節點 (背景圖片、標籤、題目、選項)，相同題目、種子與題號的使用者可共用"""
 
-        question_index_tag = f"第{postback.question_index+1}/{len(question.subject.questions)}題"
+        question_index_tag = f"第{postback.question_index+1}/{question.subject.question_count}題"
 
         mode_tag = {QuestionPostback.QuestionModeType.REVISE: "複習", QuestionPostback.QuestionModeType.TEST: "測驗"}[postback.mode]
 
+        # 背景圖片
+        background = cls.FlexImage(
+            url=cls.background(question.category.background_image, postback.question_seed + postback.question_index),
+            gravity="top",
+            size="full",
+            aspect_ratio="2:3.5",
+            aspect_mode="cover"
+        )
+        tags = cls.tag_bar(
+            question.category.name, question.subject.name, mode_tag, question_index_tag)
+        # 題目
+        content = cls.FlexBox(
+            layout="vertical",
+            contents=[
+                cls.FlexText(
+                    text=question.content,
+                    size="lg",
+                    color="#ffffff",
+                    weight="bold",
+                    wrap=True
+                )
+            ]
+        )
+        options = cls.FlexBox(
+            layout="vertical",
+            spacing="sm",
+            margin="xl",
+            contents=[
+                # 選項
+                cls.FlexBox(
+                    layout="baseline",
+                    spacing="lg",
+                    margin="xl" if option_index != 0 else "none",
+                    contents=[
+                        cls.FlexText(
+                            text=f"{ascii_uppercase[option_index]}.",
+                            size="sm",
+                            flex=1,
+                            color="#ffffffcc",
+                        ),
+                        cls.FlexText(
+                            text=option.content,
+                            size="sm",
+                            flex=18,
+                            color="#ffffffcc",
+                            wrap=True
+                        )
+                    ]
+                )
+                for option_index, option in enumerate(question.options)]
+        )
+        return background, tags, content, options
+
+    @classmethod
+    def question_bubble(cls, question: QuestionCard, postback: QuestionPostback, sections: tuple = None) -> FlexBubble:
+        # 共用的部分由 question_sections 建立，選項按鈕的 postback 含作答紀錄，每次重新建立
+        background, tags, content, options = sections or cls.question_sections(question, postback)
+
         def option_postback_action(question, option_index) -> PostbackAction:
             option = question.options[option_index]
-            answers_id = [answer.option_id for answer in question.answer]
+            answers_id = question.answer_ids
             reply_answer = postback.reply_answer
 
             if postback.mode == QuestionPostback.QuestionModeType.TEST:
@@ -388,26 +460,20 @@ class Template:
                     action_text = f"第{postback.question_index + 1}題 ➜ {ascii_uppercase[option_index]} 錯誤"
                     postback_data = " "
 
-            return PostbackAction(text=action_text, data=postback_data) 
+            return cls.PostbackAction(text=action_text, data=postback_data) 
 
 
-        bubble = FlexBubble(
+        bubble = cls.FlexBubble(
             size="giga",
-            body=FlexBox(
+            body=cls.FlexBox(
                 layout="vertical",
                 height="400px",
                 padding_all="0px",
                 contents=[
                     # 背景圖片
-                    FlexImage(
-                        url=random.choice(question.category.background_image.split(";")),
-                        gravity="top",
-                        size="full",
-                        aspect_ratio="2:3.5",
-                        aspect_mode="cover"
-                    ),
+                    background,
                     # 背景暗化層
-                    FlexBox(
+                    cls.FlexBox(
                         layout="vertical",
                         position="absolute",
                         background_color="#000000cc",
@@ -418,58 +484,19 @@ class Template:
                         padding_all="20px",
                         padding_top="20%",
                         contents=[
-                            Template.tag_bar(
-                                question.category.name, question.subject.name, mode_tag, question_index_tag),
+                            tags,
                             # 題目
-                            FlexBox(
-                                layout="vertical",
-                                contents=[
-                                    FlexText(
-                                        text=question.content,
-                                        size="lg",
-                                        color="#ffffff",
-                                        weight="bold",
-                                        wrap=True
-                                    )
-                                ]
-                            ),
-                            FlexBox(
-                                layout="vertical",
-                                spacing="sm",
-                                margin="xl",
-                                contents=[
-                                    # 選項
-                                    FlexBox(
-                                        layout="baseline",
-                                        spacing="lg",
-                                        margin="xl" if option_index != 0 else "none",
-                                        contents=[
-                                            FlexText(
-                                                text=f"{ascii_uppercase[option_index]}.",
-                                                size="sm",
-                                                flex=1,
-                                                color="#ffffffcc",
-                                            ),
-                                            FlexText(
-                                                text=option.content,
-                                                size="sm",
-                                                flex=18,
-                                                color="#ffffffcc",
-                                                wrap=True
-                                            )
-                                        ]
-                                    )
-                                    for option_index, option in enumerate(question.options)]
-                            ),
+                            content,
+                            options,
                             # 選項按鈕
-                            FlexBox(
+                            cls.FlexBox(
                                 layout="horizontal",
                                 position="absolute",
                                 offset_bottom="15px",
                                 offset_start="15px",
                                 offset_end="15px",
                                 contents=[
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="vertical",
                                         margin="lg" if option_index != 0 else "none",
                                         height="40px",
@@ -477,12 +504,12 @@ class Template:
                                         border_color="#ffffff",
                                         corner_radius="5px",
                                         contents=[
-                                            FlexFiller(),
-                                            FlexBox(
+                                            cls.FlexFiller(),
+                                            cls.FlexBox(
                                                 layout="baseline",
                                                 spacing="sm",
                                                 contents=[
-                                                        FlexText(
+                                                        cls.FlexText(
                                                             text=ascii_uppercase[option_index],
                                                             size="xl",
                                                             color="#ffffff",
@@ -492,7 +519,7 @@ class Template:
                                                         ),
                                                 ]
                                             ),
-                                            FlexFiller()
+                                            cls.FlexFiller()
                                         ]
                                     )
 
@@ -562,30 +589,30 @@ class Template:
         #     return [bubble]
         return bubble
 
-    @staticmethod
-    def result_bubble(subject: Subject, postback: QuestionPostback) -> FlexBubble:
+    @classmethod
+    def result_bubble(cls, subject: SubjectRecord, postback: QuestionPostback) -> FlexBubble:
 
         mode_tag = {QuestionPostback.QuestionModeType.REVISE: "複習", QuestionPostback.QuestionModeType.TEST: "測驗"}[postback.mode]
 
-        if postback.reply_answer:
-            score = round((100 / len(subject.questions)) * QuestionPostback.ReplyAnswer.count_correct_answers(postback.reply_answer), 1)
+        if postback.reply_answer and subject.question_count:
+            score = round((100 / subject.question_count) * QuestionPostback.ReplyAnswer.count_correct_answers(postback.reply_answer), 1)
         else:
             score = "None"
 
-        bubble = FlexBubble(
-            body=FlexBox(
+        bubble = cls.FlexBubble(
+            body=cls.FlexBox(
                 layout='vertical',
                 padding_all="0px",
                 height="200px",
                 contents=[
-                    FlexImage(
+                    cls.FlexImage(
                         url=random.choice(subject.category.background_image.split(";")),
                         gravity="top",
                         size="full",
                         aspect_ratio="2:3",
                         aspect_mode="cover"
                     ),
-                    FlexBox(
+                    cls.FlexBox(
                         layout='vertical',
                         position="absolute",
                         background_color="#2D2D2DAA",
@@ -596,11 +623,11 @@ class Template:
                         padding_all="20px",
                         padding_top="135px",
                         contents=[
-                            FlexBox(
+                            cls.FlexBox(
                                 layout="horizontal",
                                 contents=[
                                     # 按鍵
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="vertical",
                                         spacing="sm",
                                         # margin = "xxl",
@@ -609,29 +636,29 @@ class Template:
                                         border_color="#ffffff",
                                         corner_radius="4px",
                                         contents=[
-                                            FlexFiller(),
-                                            FlexBox(
+                                            cls.FlexFiller(),
+                                            cls.FlexBox(
                                                 layout="baseline",
                                                 spacing="sm",
                                                 contents=[
-                                                    FlexText(
+                                                    cls.FlexText(
                                                         text=f"查看{QuestionPostback.ReplyAnswer.count_incorrect_answers(postback.reply_answer)}題錯誤",
                                                         color="#ffffff",
                                                         offset_top="-2px",
                                                         align="center",
-                                                        action=PostbackAction(
+                                                        action=cls.PostbackAction(
                                                             text="查看錯誤 :P" if QuestionPostback.ReplyAnswer.count_incorrect_answers(
                                                                 postback.reply_answer) else "沒有錯誤 :)",
                                                             data=postback.configure(flag=4, question_index=0) if QuestionPostback.ReplyAnswer.count_incorrect_answers(
                                                                 postback.reply_answer) else " "
                                                         )
                                                     ) if postback.mode == QuestionPostback.QuestionModeType.TEST else
-                                                    FlexText(
+                                                    cls.FlexText(
                                                         text="選擇其他科目",
                                                         color="#ffffff",
                                                         offset_top="-2px",
                                                         align="center",
-                                                        action=PostbackAction(
+                                                        action=cls.PostbackAction(
                                                             data=QuestionPostback.initialize(
                                                                 flag=1,
                                                                 category_id=postback.category_id
@@ -640,10 +667,10 @@ class Template:
                                                     )
                                                 ]
                                             ),
-                                            FlexFiller()
+                                            cls.FlexFiller()
                                         ]
                                     ),
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="vertical",
                                         spacing="sm",
                                         margin="xl",
@@ -652,17 +679,17 @@ class Template:
                                         border_color="#ffffff",
                                         corner_radius="4px",
                                         contents=[
-                                            FlexFiller(),
-                                            FlexBox(
+                                            cls.FlexFiller(),
+                                            cls.FlexBox(
                                                 layout="baseline",
                                                 spacing="sm",
                                                 contents=[
-                                                    FlexText(
+                                                    cls.FlexText(
                                                         text="重新測驗",
                                                         color="#ffffff",
                                                         offset_top="-2px",
                                                         align="center",
-                                                        action=PostbackAction(
+                                                        action=cls.PostbackAction(
                                                             data=postback.configure(
                                                                 flag=3,
                                                                 question_index=0,
@@ -671,12 +698,12 @@ class Template:
                                                             )
                                                         )
                                                     ) if postback.mode == QuestionPostback.QuestionModeType.TEST else
-                                                    FlexText(
+                                                    cls.FlexText(
                                                         text="重新複習",
                                                         color="#ffffff",
                                                         offset_top="-2px",
                                                         align="center",
-                                                        action=PostbackAction(
+                                                        action=cls.PostbackAction(
                                                             data=postback.configure(
                                                                 flag=3,
                                                                 question_index=0,
@@ -686,21 +713,21 @@ class Template:
                                                     )
                                                 ]
                                             ),
-                                            FlexFiller(),
+                                            cls.FlexFiller(),
                                         ]
                                     )
                                 ]
                             )
                         ]
                     ),
-                    Template.tag_bar(subject.category.name, subject.name, mode_tag),
-                    FlexBox(
+                    cls.tag_bar(subject.category.name, subject.name, mode_tag),
+                    cls.FlexBox(
                         layout="vertical",
                         position="absolute",
                         offset_top="30%",
                         offset_start="18px",
                         contents=[
-                            FlexText(
+                            cls.FlexText(
                                 text=f"{score}分" if postback.reply_answer else "結束",
                                 size="4xl",
                                 color="#ffffff",
@@ -713,11 +740,45 @@ class Template:
         )
         return bubble
 
-    @staticmethod
-    def review_bubble(question: Question, question_index: int, prev_question_index: int, next_question_index: int, postback: QuestionPostback) -> FlexBubble:
+    @classmethod
+    def review_sections(cls, question: QuestionCard, question_index: int, postback: QuestionPostback) -> tuple:
+        """查看錯誤訊息中與作答紀錄無關的節點 (背景圖片、標籤、題目)"""
+
+        question_index_tag = "第{0}/{1}題".format(
+            question_index+1, question.subject.question_count)
 
-        def option_background_color(option: QuestionOption, option_index: int) -> str:
-            if option.option_id in [answer.option_id for answer in question.answer]:
+        # 背景圖片
+        background = cls.FlexImage(
+            url=cls.background(question.category.background_image, postback.question_seed + question_index),
+            gravity="top",
+            size="full",
+            aspect_ratio="2:3.5",
+            aspect_mode="cover"
+        )
+        tags = cls.tag_bar(
+            question.category.name, question.subject.name, "查看", question_index_tag)
+        # 題目
+        content = cls.FlexBox(
+            layout="vertical",
+            contents=[
+                cls.FlexText(
+                    text=question.content,
+                    size="lg",
+                    color="#ffffff",
+                    weight="bold",
+                    wrap=True
+                )
+            ]
+        )
+        return background, tags, content
+
+    @classmethod
+    def review_bubble(cls, question: QuestionCard, question_index: int, prev_question_index: int, next_question_index: int, postback: QuestionPostback, sections: tuple = None) -> FlexBubble:
+        # 選項顏色與上一題、下一題按鈕取決於作答紀錄，每次重新建立
+        background, tags, content = sections or cls.review_sections(question, question_index, postback)
+
+        def option_background_color(option: OptionCard, option_index: int) -> str:
+            if option.option_id in question.answer_ids:
                 result = "#13C900cc"
             elif ascii_uppercase[option_index] == postback.reply_answer[question_index]:
                 result = "#FF2D2Dcc"
@@ -725,26 +786,17 @@ class Template:
                 result = None
             return result
 
-        question_index_tag = "第{0}/{1}題".format(
-            question_index+1, len(question.subject.questions))
-
-        bubble = FlexBubble(
+        bubble = cls.FlexBubble(
             size="giga",
-            body=FlexBox(
+            body=cls.FlexBox(
                 layout="vertical",
                 height="400px",
                 padding_all="0px",
                 contents=[
                     # 背景圖片
-                    FlexImage(
-                        url=random.choice(question.category.background_image.split(";")),
-                        gravity="top",
-                        size="full",
-                        aspect_ratio="2:3.5",
-                        aspect_mode="cover"
-                    ),
+                    background,
                     # 背景暗化層
-                    FlexBox(
+                    cls.FlexBox(
                         layout="vertical",
                         position="absolute",
                         background_color="#000000cc",
@@ -755,28 +807,16 @@ class Template:
                         padding_all="20px",
                         padding_top="20%",
                         contents=[
-                            Template.tag_bar(
-                                question.category.name, question.subject.name, "查看", question_index_tag),
+                            tags,
                             # 題目
-                            FlexBox(
-                                layout="vertical",
-                                contents=[
-                                    FlexText(
-                                        text=question.content,
-                                        size="lg",
-                                        color="#ffffff",
-                                        weight="bold",
-                                        wrap=True
-                                    )
-                                ]
-                            ),
+                            content,
                             # 選項
-                            FlexBox(
+                            cls.FlexBox(
                                 layout="vertical",
                                 spacing="sm",
                                 margin="xl",
                                 contents=[
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="baseline",
                                         spacing="xs",
                                         corner_radius="5px",
@@ -784,13 +824,13 @@ class Template:
                                         background_color=option_background_color(
                                             option, option_index),
                                         contents=[
-                                            FlexText(
+                                            cls.FlexText(
                                                 text=f" {ascii_uppercase[option_index]}.",
                                                 size="sm",
                                                 flex=1,
                                                 color="#ffffffcc",
                                             ),
-                                            FlexText(
+                                            cls.FlexText(
                                                 text=str(option.content),
                                                 size="sm",
                                                 flex=10,
@@ -802,14 +842,14 @@ class Template:
                                     for option_index, option in enumerate(question.options)]
                             ),
                             # 選項按鈕
-                            FlexBox(
+                            cls.FlexBox(
                                 layout="horizontal",
                                 position="absolute",
                                 offset_bottom="15px",
                                 offset_start="10px",
                                 offset_end="10px",
                                 contents=[
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="vertical",
                                         # margin = "xl",
                                         height="40px",
@@ -817,55 +857,55 @@ class Template:
                                         border_color="#ffffff",
                                         corner_radius="4px",
                                         contents=[
-                                            FlexFiller(),
-                                            FlexBox(
+                                            cls.FlexFiller(),
+                                            cls.FlexBox(
                                                 layout="baseline",
                                                 spacing="sm",
                                                 contents=[
-                                                    FlexFiller(),
-                                                    FlexText(
+                                                    cls.FlexFiller(),
+                                                    cls.FlexText(
                                                         text=f"第{prev_question_index+1}題",
                                                         color="#ffffff",
                                                         flex=0,
-                                                        action=PostbackAction(
+                                                        action=cls.PostbackAction(
                                                             text=f"上一題 ➜ 第{prev_question_index+1}題",
                                                             data=postback.configure(
                                                                 question_index=prev_question_index
                                                             )
                                                         )
                                                     ),
-                                                    FlexFiller()
+                                                    cls.FlexFiller()
                                                 ]
                                             ),
-                                            FlexFiller()
+                                            cls.FlexFiller()
                                         ]
                                     ),
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="vertical",
                                         # margin = "xl",
                                         height="40px",
                                         border_width="1px",
                                         corner_radius="4px",
                                         contents=[
-                                            FlexFiller(),
-                                            FlexBox(
+                                            cls.FlexFiller(),
+                                            cls.FlexBox(
                                                 layout="baseline",
                                                 spacing="sm",
                                                 contents=[
-                                                    FlexFiller(),
-                                                    FlexText(
+                                                    cls.FlexFiller(),
+                                                    cls.FlexText(
                                                         text="◈",
                                                         color="#ffffff",
-                                                        action=PostbackAction(
+                                                        action=cls.PostbackAction(
                                                             data=QuestionPostback.initialize()
                                                         )
                                                     )
                                                 ]
                                             ),
-                                            FlexFiller()
+                                            cls.FlexFiller()
                                         ]
                                     ),
-                                    FlexBox(
+                                    cls.FlexBox(
                                         layout="vertical",
                                         margin="xl",
                                         height="40px",
@@ -873,27 +913,27 @@ class Template:
                                         border_color="#ffffff",
                                         corner_radius="4px",
                                         contents=[
-                                            FlexFiller(),
-                                            FlexBox(
+                                            cls.FlexFiller(),
+                                            cls.FlexBox(
                                                 layout="baseline",
                                                 spacing="sm",
                                                 contents=[
-                                                    FlexFiller(),
-                                                    FlexText(
+                                                    cls.FlexFiller(),
+                                                    cls.FlexText(
                                                         text=f"第{next_question_index+1}題",
                                                         color="#ffffff",
                                                         flex=0,
-                                                        action=PostbackAction(
+                                                        action=cls.PostbackAction(
                                                             text=f"下一題 ➜ 第{next_question_index+1}題",
                                                             data=postback.configure(
                                                                 question_index=next_question_index
                                                             )
                                                         )
                                                     ),
-                                                    FlexFiller()
+                                                    cls.FlexFiller()
                                                 ]
                                             ),
-                                            FlexFiller()
+                                            cls.FlexFiller()
                                         ]
                                     )
                                 ]
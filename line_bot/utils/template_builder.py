@@ -1,112 +1,197 @@
+import os
 import random
 
+from typing import Callable
+
 from line_bot.utils.template import Template
 from line_bot.utils.postback import QuestionPostback
+from question_bank.cache import TTLCache
 from question_bank.database import QuestionBank, QuestionRandomizer
+from question_bank.metrics import span
 
+from linebot.v3.messaging import AsyncMessagingApi, MessagingApi
 from linebot.v3.messaging.models import (
-    FlexMessage, FlexCarousel
+    FlexMessage, FlexCarousel, ReplyMessageRequest, TextMessage, StickerMessage
 )
 
-class TemplateBuilder:
 
-    @staticmethod
-    def select_category() -> FlexMessage:
-        category_bubbles = []
+# 類科、科目選單快取：以題庫資料本身為 key，資料變動時自然失效
+# 每個 bubble 依背景圖片各預先建立一個版本
+menu_cache = TTLCache(
+    maxsize=int(os.environ.get("menu_cache_size", 128)),
+    ttl=None
+)
 
-        for category in QuestionBank.get_categorys():
-            category_bubbles.append(Template.category_bubble(category))
+# 題目、查看錯誤訊息中與作答紀錄無關的部分：(題目, 種子, 題號) 對應亂數處理後的題目與共用的節點，
+# 同一份測驗 (相同種子) 的每位使用者共用，含作答紀錄的按鈕每次重新建立
+render_cache = TTLCache(
+    maxsize=int(os.environ.get("render_cache_size", 512)),
+    ttl=None
+)
 
-        flex_message = FlexMessage(
-            alt_text='題庫 | 選擇類科', 
-            contents=FlexCarousel(contents=category_bubbles)
-        )
+
+class TemplateBuilder:
+    # 訊息建構函式，子類別可替換為其他實作 (例如直接產生 dict)
+    template = Template
+    FlexMessage = FlexMessage
+    FlexCarousel = FlexCarousel
+    ReplyMessageRequest = ReplyMessageRequest
+    TextMessage = TextMessage
+    StickerMessage = StickerMessage
+
+    @classmethod
+    def select_category(cls) -> FlexMessage:
+        categorys = QuestionBank.get_categorys()
+
+        with span("template"):
+            variants = menu_cache.get_or_set((cls, "category", categorys), lambda: tuple(
+                tuple(cls.template.category_bubble(category, background_image)
+                      for background_image in category.background_image.split(";"))
+                for category in categorys
+            ))
+
+            flex_message = cls.FlexMessage(
+                alt_text='題庫 | 選擇類科', 
+                contents=cls.FlexCarousel(contents=[random.choice(bubbles) for bubbles in variants])
+            )
         return flex_message
     
-    @staticmethod
-    def select_subject(postback: QuestionPostback) -> FlexMessage:
-        subject_bubbles = []
-
-        for subject in QuestionBank.get_subjects(category_id=postback.category_id):
-            subject_bubbles.append(Template.subject_bubble(subject, postback))
-        
-        flex_message = FlexMessage(
-            alt_text='題庫 | 選擇科目', 
-            contents=FlexCarousel(contents=subject_bubbles)
-        )
+    @classmethod
+    def select_subject(cls, postback: QuestionPostback) -> FlexMessage:
+        subjects = QuestionBank.get_subjects(category_id=postback.category_id)
+
+        # 選項的 postback 資料沿用目前的 postback，需納入 key
+        with span("template"):
+            variants = menu_cache.get_or_set((cls, "subject", postback.row_string, subjects), lambda: tuple(
+                tuple(cls.template.subject_bubble(subject, postback, background_image)
+                      for background_image in subject.background_image.split(";"))
+                for subject in subjects
+            ))
+            
+            flex_message = cls.FlexMessage(
+                alt_text='題庫 | 選擇科目', 
+                contents=cls.FlexCarousel(contents=[random.choice(bubbles) for bubbles in variants])
+            )
         return flex_message
     
-    @staticmethod
-    def select_mode(postback: QuestionPostback) -> FlexMessage:
+    @classmethod
+    def select_mode(cls, postback: QuestionPostback) -> FlexMessage:
         subject = QuestionBank.get_subject(category_id=postback.category_id, subject_id=postback.subject_id)
-        bubble = Template.mode_bubble(subject, postback)
+        with span("template"):
+            bubble = cls.template.mode_bubble(subject, postback)
 
-        flex_message = FlexMessage(
-            alt_text='題庫 | 選擇科目', 
-            contents=FlexCarousel(contents=[bubble])
-        )
+            flex_message = cls.FlexMessage(
+                alt_text='題庫 | 選擇科目', 
+                contents=cls.FlexCarousel(contents=[bubble])
+            )
         return flex_message
 
-    @staticmethod
-    def question(postback: QuestionPostback) -> FlexMessage:
-
-        questions = QuestionBank.get_questions(category_id=postback.category_id, subject_id=postback.subject_id)
-        questions.sort(key=lambda q: q.question_id)
+    @classmethod
+    def question(cls, postback: QuestionPostback) -> FlexMessage:
 
-        if postback.question_index >= len(questions):
-            return TemplateBuilder.question_result(postback)
+        # 以科目的題目編號 (已快取，不含題目內容) 判斷是否作答完畢，
+        # 科目快取中的題目數量可能早於題目編號載入，只用於顯示
+        deck = QuestionBank.get_deck(category_id=postback.category_id, subject_id=postback.subject_id)
+        if postback.question_index >= len(deck):
+            return cls.question_result(postback)
 
-        # shuffle questions
-        random.Random(postback.question_seed).shuffle(questions)
+        card = QuestionBank.get_question(
+            category_id=postback.category_id, subject_id=postback.subject_id,
+            seed=postback.question_seed, index=postback.question_index)
 
-        randomizer = QuestionRandomizer(questions[postback.question_index], postback.question_seed)
-        randomizer.process_variables()
-
-        question = randomizer.question
+        # 題目資料本身納入 key，題目修改後自然失效
+        question, sections = render_cache.get_or_set(
+            (cls, "question", card, postback.question_seed, postback.question_index, postback.mode),
+            lambda: cls.render_sections(card, postback.question_seed, lambda question: cls.template.question_sections(question, postback)))
 
-        bubble = Template.question_bubble(question, postback)
+        with span("template"):
+            bubble = cls.template.question_bubble(question, postback, sections)
 
-        flex_message = FlexMessage(
-            alt_text='題庫 | 題目 {} / {}'.format(len(question.subject.questions), postback.question_index+1), 
-            contents=FlexCarousel(contents=[bubble])
-        )
+            flex_message = cls.FlexMessage(
+                alt_text='題庫 | 題目 {} / {}'.format(len(deck), postback.question_index+1), 
+                contents=cls.FlexCarousel(contents=[bubble])
+            )
         return flex_message
     
-    @staticmethod
-    def question_result(postback: QuestionPostback) -> FlexMessage:
-        subject = QuestionBank.get_subject(category_id=postback.category_id, subject_id=postback.subject_id)
-
-        bubble = Template.result_bubble(subject, postback)
-
-        flex_message = FlexMessage(
-            alt_text='題庫 | 結果 ', 
-            contents=FlexCarousel(contents=[bubble])
-        )
+    @classmethod
+    def question_result(cls, postback: QuestionPostback) -> FlexMessage:
+        # 牌組的科目資料以題目編號計算題數
+        subject = QuestionBank.get_deck(category_id=postback.category_id, subject_id=postback.subject_id).subject
+
+        with span("template"):
+            bubble = cls.template.result_bubble(subject, postback)
+
+            flex_message = cls.FlexMessage(
+                alt_text='題庫 | 結果 ', 
+                contents=cls.FlexCarousel(contents=[bubble])
+            )
         return flex_message
     
-    @staticmethod
-    def question_review(postback: QuestionPostback) -> FlexMessage:
+    @classmethod
+    def question_review(cls, postback: QuestionPostback) -> FlexMessage:
         incorrect_answers_index = [i for i, ans in enumerate(postback.reply_answer) if ans != "*"]
 
-        questions = QuestionBank.get_questions(category_id=postback.category_id, subject_id=postback.subject_id)
-        questions.sort(key=lambda q: q.question_id)
-
-        # shuffle questions
-        random.Random(postback.question_seed).shuffle(questions)
         question_index = incorrect_answers_index[0] if postback.question_index == 0 else postback.question_index
 
         next_question_index = incorrect_answers_index[(incorrect_answers_index.index(question_index) + 1) % len(incorrect_answers_index)]
         prev_question_index = incorrect_answers_index[(incorrect_answers_index.index(question_index) - 1) % len(incorrect_answers_index)]
 
-        randomizer = QuestionRandomizer(questions[question_index], postback.question_seed)
-        randomizer.process_variables()
+        card = QuestionBank.get_question(
+            category_id=postback.category_id, subject_id=postback.subject_id,
+            seed=postback.question_seed, index=question_index)
+
+        question, sections = render_cache.get_or_set(
+            (cls, "review", card, postback.question_seed, question_index),
+            lambda: cls.render_sections(card, postback.question_seed, lambda question: cls.template.review_sections(question, question_index, postback)))
+
+        with span("template"):
+            bubble = cls.template.review_bubble(question, question_index, next_question_index, prev_question_index, postback, sections)
+
+            flex_message = cls.FlexMessage(
+                alt_text='題庫 | 查看錯誤 ', 
+                contents=cls.FlexCarousel(contents=[bubble])
+            )
+        return flex_message
+
+    @staticmethod
+    def render_sections(card, question_seed: int, build_sections: Callable) -> tuple:
+        """亂數處理題目並建立共用的節點，回傳 (題目, 節點)"""
+        with span("randomize"):
+            randomizer = QuestionRandomizer(card, question_seed)
+            randomizer.process_variables()
 
         question = randomizer.question
 
-        bubble = Template.review_bubble(question, question_index, next_question_index, prev_question_index, postback)
+        with span("template"):
+            sections = build_sections(question)
+        return question, sections
 
-        flex_message = FlexMessage(
-            alt_text='題庫 | 查看錯誤 ', 
-            contents=FlexCarousel(contents=[bubble])
+    @classmethod
+    def reply_request(cls, reply_token: str, messages: list) -> ReplyMessageRequest:
+        return cls.ReplyMessageRequest(
+            reply_token=reply_token,
+            messages=messages
         )
-        return flex_message
\ No newline at end of file
+
+    @staticmethod
+    def post_reply(line_bot_api: MessagingApi, reply_message: ReplyMessageRequest):
+        # AsyncMessagingApi 回傳 coroutine
+        return line_bot_api.reply_message(reply_message)
+
+    @classmethod
+    def reply(cls, line_bot_api: MessagingApi, reply_token: str, messages: list) -> None:
+        # request: 建立 (並驗證) 回覆請求；SDK 在送出時才轉為 JSON (無法傳入已序列化的 body)，
+        # 轉換 JSON 的時間計入 reply
+        with span("request"):
+            reply_message = cls.reply_request(reply_token, messages)
+
+        with span("reply"):
+            cls.post_reply(line_bot_api, reply_message)
+
+    @classmethod
+    async def reply_async(cls, line_bot_api: AsyncMessagingApi, reply_token: str, messages: list) -> None:
+        with span("request"):
+            reply_message = cls.reply_request(reply_token, messages)
+
+        with span("reply"):
+            await cls.post_reply(line_bot_api, reply_message)
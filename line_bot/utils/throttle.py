@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+from typing import Callable, Hashable, Optional
+
+from question_bank.cache import CacheStats, TTLCache
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RequestThrottle:
+    """
+    每位使用者的 token bucket (每秒補充 rate 個，最多 burst 個)，
+    加上相同 postback data 在 coalesce_window 秒內只處理一次
+    """
+
+    COALESCED = "coalesced"
+    RATE_LIMITED = "rate_limited"
+
+    def __init__(self, rate: float = 5, burst: float = 10, coalesce_window: float = 1.5,
+                 notice_interval: float = 10, maxsize: int = 65536, timer: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_window = coalesce_window
+        self.notice_interval = notice_interval
+        self.timer = timer
+        self._lock = threading.Lock()
+
+        # 閒置 burst / rate 秒後 bucket 必定已滿，可以直接丟棄
+        self.buckets = TTLCache(maxsize=maxsize, ttl=burst / rate if rate > 0 else None, timer=timer)
+        self.recent = TTLCache(maxsize=maxsize, ttl=coalesce_window or None, timer=timer)
+        # 被限制時每 notice_interval 秒最多提醒一次，避免回覆本身被濫用
+        self.notices = TTLCache(maxsize=maxsize, ttl=notice_interval or None, timer=timer)
+
+    def check(self, user_id: Hashable, data: str) -> Optional[str]:
+        """允許處理時回傳 None，否則回傳略過的原因"""
+        if self.coalesce_window > 0 and not self.recent.add((user_id, data)):
+            return self.COALESCED
+        if self.rate > 0 and not self.take(user_id):
+            return self.RATE_LIMITED
+        return None
+
+    def take(self, user_id: Hashable) -> bool:
+        now = self.timer()
+        bucket = self.buckets.get_or_set(user_id, lambda: TokenBucket(self.burst, now))
+        with self._lock:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            allowed = bucket.tokens >= 1
+            if allowed:
+                bucket.tokens -= 1
+        # 重新計算過期時間，使 bucket 從最後一次使用起算閒置時間
+        self.buckets.set(user_id, bucket)
+        return allowed
+
+    def should_notify(self, user_id: Hashable) -> bool:
+        return not self.notice_interval or self.notices.add(user_id)
+
+    def stats(self) -> CacheStats:
+        return self.buckets.stats()
+
+    @classmethod
+    def from_env(cls) -> "RequestThrottle":
+        # line_rate_limit=0 停用限速，line_coalesce_window=0 停用合併
+        return cls(
+            rate=float(os.environ.get("line_rate_limit", 5)),
+            burst=float(os.environ.get("line_rate_burst", 10)),
+            coalesce_window=float(os.environ.get("line_coalesce_window", 1.5)),
+            notice_interval=float(os.environ.get("line_rate_notice_interval", 10)),
+            maxsize=int(os.environ.get("line_throttle_size", 65536))
+        )
@@ -1,33 +1,46 @@
+import atexit
 import datetime
 import os
 import logging
 
+from typing import Optional
+
 import pydantic
 
+from line_bot.utils.client import async_line_api, line_api
+from line_bot.utils.dedupe import MemoryDeduplicator, build_deduplicator
+from line_bot.utils.dispatcher import EventDispatcher, LineWebhookHandler, event_source_key
 from line_bot.utils.template_builder import TemplateBuilder
+from line_bot.utils.raw_template import RawTemplateBuilder
 from line_bot.utils.postback import QuestionPostback
-from question_bank.exception import CategoryNotFoundError, SubjectNotFoundError
+from line_bot.utils.profile import LazyProfile, get_profile, get_profile_async, profile_cache, profile_mode
+from line_bot.utils.template_builder import menu_cache, render_cache
+from line_bot.utils.throttle import RequestThrottle
+from question_bank.cache import CacheStats
+from question_bank.database import card_cache, catalog_cache, deck_cache, pool_stats, readiness
+from question_bank.exception import CategoryNotFoundError, SubjectNotFoundError, QuestionNotFoundError
+from question_bank.expression import compile_expression
+from question_bank.metrics import (
+    registry,
+    cache_collector,
+    stats_collector,
+    errors_total,
+    reply_failures_total,
+    shed_requests_total,
+    span
+)
+from question_bank.permutation import permutation_cache
 
+from asgiref.sync import sync_to_async
 from django import http
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 
-from linebot.v3 import (
-    WebhookHandler
-)
 from linebot.v3.exceptions import (
     InvalidSignatureError
 )
-from linebot.v3.messaging import (
-    Configuration,
-    ApiClient,
-    MessagingApi,
-    ReplyMessageRequest,
-    TextMessage,
-    FlexMessage,
-    StickerMessage,
-    FlexCarousel,
-)
+from linebot.v3.messaging import ApiException
 from linebot.v3.webhooks import (
     MessageEvent,
     PostbackEvent,
@@ -35,11 +48,65 @@ from linebot.v3.webhooks import (
 )
 
 
-configuration = Configuration(access_token=os.environ.get("channel_access_token"))
-handler = WebhookHandler(os.environ.get("secret"))
+# 連點相同按鈕只處理一次，並限制每位使用者的請求頻率
+throttle = RequestThrottle.from_env()
+
+# 同步與 async 處理共用的事件去重紀錄
+deduplicator = build_deduplicator()
+
+# 同一個 webhook 內不同使用者的事件同時處理的執行緒數，1 為依序處理
+handler = LineWebhookHandler(
+    os.environ.get("secret"),
+    concurrency=int(os.environ.get("line_payload_concurrency", 8)),
+    deduplicator=deduplicator
+)
+# async_callback 使用的處理函式 (async def)
+async_handler = LineWebhookHandler(os.environ.get("secret"), deduplicator=deduplicator)
 
 logger = logging.getLogger('line_bot')
 
+# sync: 處理完所有事件才回應 / queue: 驗證簽章後交由背景工作執行緒處理並立即回應
+# async: 使用 async_callback 與 AsyncMessagingApi (需以 ASGI 執行)
+webhook_mode = os.environ.get("line_webhook_mode", "sync")
+
+dispatcher = EventDispatcher(
+    handler.dispatch,
+    workers=int(os.environ.get("line_worker_count", 4)),
+    queue_size=int(os.environ.get("line_worker_queue_size", 256))
+)
+atexit.register(dispatcher.shutdown, 5)
+
+# model: 以 pydantic 模型建構訊息 / raw: 直接建構 dict 並送出 JSON
+flex_mode = os.environ.get("line_flex_mode", "model")
+
+builder = RawTemplateBuilder if flex_mode == "raw" else TemplateBuilder
+
+
+def expression_cache_stats() -> CacheStats:
+    info = compile_expression.cache_info()
+    return CacheStats(hits=info.hits, misses=info.misses, evictions=0, size=info.currsize, maxsize=info.maxsize)
+
+
+cache_stats = {
+    "catalog": catalog_cache.stats,
+    "deck": deck_cache.stats,
+    "card": card_cache.stats,
+    "menu": menu_cache.stats,
+    "render": render_cache.stats,
+    "profile": profile_cache.stats,
+    "permutation": permutation_cache.stats,
+    "expression": expression_cache_stats,
+    "throttle": throttle.stats,
+}
+if isinstance(deduplicator, MemoryDeduplicator):
+    cache_stats["dedupe"] = deduplicator.stats
+registry.register_collector(cache_collector(cache_stats))
+registry.register_collector(stats_collector("question_bank_pool", pool_stats.snapshot, "Database connection pool statistics"))
+registry.register_collector(stats_collector("linebot_dispatcher", dispatcher.stats, "Background event dispatcher statistics"))
+registry.register_collector(stats_collector(
+    "question_bank_database", lambda: {"ready": int(readiness.ready)}, "Whether the database is reachable"))
+
+
 # Create your views here.
 @csrf_exempt 
 def callback(request):
@@ -51,116 +118,218 @@ def callback(request):
             # get request body as text
             body = request.body.decode('utf-8')
 
-            # handle webhook body
-            handler.handle(body, signature)
-        except (InvalidSignatureError, KeyError):
+            if webhook_mode == "queue":
+                payload = handler.parse(body, signature)
+                for event in payload.events:
+                    dispatcher.submit(event, payload.destination)
+            else:
+                # handle webhook body
+                handler.handle(body, signature)
+        except (InvalidSignatureError, KeyError) as e:
+            errors_total.inc(exception=type(e).__name__)
             return http.HttpResponseBadRequest("Invalid signature. Please check your channel access token/channel secret.")
 
         return http.HttpResponse("OK")
     else:
         return http.HttpResponseNotAllowed(["POST"])
 
+
+def metrics(request):
+    return http.HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def ready(request):
+    # 資料庫尚未連線成功時回傳 503，並在背景重新嘗試
+    status = readiness.snapshot()
+    if not status["ready"] and not status["warming_up"]:
+        readiness.warm_up()
+    return http.JsonResponse(status, status=200 if status["ready"] else 503)
+
+
+def send_reply(line_bot_api, reply_token: str, messages: list) -> None:
+    try:
+        builder.reply(line_bot_api, reply_token, messages)
+    except ApiException as e:
+        # reply token 逾時或已使用時 LINE 回傳 400
+        reply_failures_total.inc(status=e.status)
+        raise
+
+
+async def send_reply_async(line_bot_api, reply_token: str, messages: list) -> None:
+    try:
+        await builder.reply_async(line_bot_api, reply_token, messages)
+    except ApiException as e:
+        reply_failures_total.inc(status=e.status)
+        raise
+
+
+def shed_postback(event) -> Optional[list]:
+    """在查詢題庫前略過連點或過於頻繁的 postback，回傳要回覆的訊息 (可能為空)，None 表示照常處理"""
+    user_id = event_source_key(event)
+    reason = throttle.check(user_id, event.postback.data)
+    if reason is None:
+        return None
+
+    shed_requests_total.inc(reason=reason)
+    if reason == RequestThrottle.RATE_LIMITED and throttle.should_notify(user_id):
+        return [builder.TextMessage(text='操作過於頻繁，請稍後再試')]
+    return []
+
+
+def build_postback_messages(event, user_profile) -> list:
+    postback = QuestionPostback(user_profile, event.postback.data)
+
+    logger.debug("=== Handling Line Postback Event ===")
+    logger.debug("Time: %s", datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    logger.debug("Line User ID: %s", user_profile.user_id)
+    # 延遲載入模式下不為了記錄而額外呼叫 API
+    if not isinstance(user_profile, LazyProfile) or user_profile.loaded:
+        logger.debug("Display Name: %s", user_profile.display_name)
+    logger.debug(f"Postback Data: {event.postback.data}")
+    logger.debug("Data Size: %d/300", len(event.postback.data))
+    logger.debug("====================================")
+
+    match postback.flag:
+        case QuestionPostback.PostbackFlag.SELECT_CATEGORY:
+            message = builder.select_category()
+        case QuestionPostback.PostbackFlag.SELECT_SUBJECT:
+            message = builder.select_subject(postback)
+        case QuestionPostback.PostbackFlag.SELECT_MODE:
+            message = builder.select_mode(postback)
+        case QuestionPostback.PostbackFlag.QUESTION:
+            message = builder.question(postback)
+        case QuestionPostback.PostbackFlag.QUESTION_REVIEW:
+            message = builder.question_review(postback)
+        case _:
+            raise ValueError('Unknown message action flag: {}'.format(postback.flag))
+
+    return message if isinstance(message, list) else [message]
+
+
+def error_messages(e: Exception) -> list:
+    errors_total.inc(exception=type(e).__name__)
+
+    if isinstance(e, (CategoryNotFoundError, SubjectNotFoundError, QuestionNotFoundError)):
+        logging.exception("Failed to build Line flex message template due to missing category, subject or question: %s", e)
+        return [
+            builder.TextMessage(text='類科或科目遭到變更或移除'), 
+            builder.StickerMessage(package_id='11537', sticker_id='52002749')
+        ]
+
+    elif isinstance(e, pydantic.ValidationError):
+        logging.exception("Error building Line flex message template: %s", e)
+        return [
+            builder.TextMessage(text='訊息建構錯誤'),
+            builder.StickerMessage(package_id='11537', sticker_id='52002749')
+        ]
+
+    else:
+        logging.exception("Handling Line Postback Event Error: %s", e)
+        return [
+            builder.TextMessage(text='發生其他問題'), 
+            builder.StickerMessage(package_id='11537', sticker_id='52002770')
+        ]
+
+
 @handler.add(PostbackEvent)
 def handle_postback_message(event):
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-        
+    line_bot_api = line_api.get()
+
+    shed_messages = shed_postback(event)
+    if shed_messages is not None:
+        if shed_messages:
+            send_reply(line_bot_api, event.reply_token, shed_messages)
+        return http.HttpResponse("OK")
+    
+    try:
+        with span("profile"):
+            user_profile = get_profile(line_bot_api, event.source.user_id)
+        messages = build_postback_messages(event, user_profile)
+
+    except Exception as ex:
+        messages = error_messages(ex)
+
+    finally:
+        send_reply(line_bot_api, event.reply_token, messages)
+
+    return http.HttpResponse("OK")
+
+
+@handler.add(MessageEvent, message=TextMessageContent)
+def handle_message(event):
+    line_bot_api = line_api.get()
+    
+    if event.message.text == "題庫":
         try:
-            user_profile = line_bot_api.get_profile(event.source.user_id)
-            postback = QuestionPostback(user_profile, event.postback.data)
-
-            logger.debug("=== Handling Line Postback Event ===")
-            logger.debug("Time: %s", datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-            logger.debug("Line User ID: %s", user_profile.user_id)
-            logger.debug("Display Name: %s", user_profile.display_name)
-            logger.debug(f"Postback Data: {event.postback.data}")
-            logger.debug("Data Size: %d/300", len(event.postback.data))
-            logger.debug("====================================")
-
-            match postback.flag:
-                case QuestionPostback.PostbackFlag.SELECT_CATEGORY:
-                    message = TemplateBuilder.select_category()
-                case QuestionPostback.PostbackFlag.SELECT_SUBJECT:
-                    message = TemplateBuilder.select_subject(postback)
-                case QuestionPostback.PostbackFlag.SELECT_MODE:
-                    message = TemplateBuilder.select_mode(postback)
-                case QuestionPostback.PostbackFlag.QUESTION:
-                    message = TemplateBuilder.question(postback)
-                case QuestionPostback.PostbackFlag.QUESTION_REVIEW:
-                    message = TemplateBuilder.question_review(postback)
-                case _:
-                    raise ValueError('Unknown message action flag: {}'.format(postback.flag))
-            
-            reply_message = ReplyMessageRequest(
-                reply_token=event.reply_token,
-                messages=message if isinstance(message, list) else [message]
-            )
-
-        except (CategoryNotFoundError, SubjectNotFoundError) as e:
-            logging.exception("Failed to build Line flex message template due to missing category or subject: %s", e)
-            reply_message = ReplyMessageRequest(
-                reply_token=event.reply_token,
-                messages=[
-                    TextMessage(text='類科或科目遭到變更或移除'), 
-                    StickerMessage(package_id='11537', sticker_id='52002749')
-                ]
-            )
-
-        except pydantic.ValidationError as e:
-            logging.exception("Error building Line flex message template: %s", e)
-            reply_message = ReplyMessageRequest(
-                reply_token=event.reply_token,
-                messages=[
-                    TextMessage(text='訊息建構錯誤'),
-                    StickerMessage(package_id='11537', sticker_id='52002749')
-                ]
-            )
+            messages = [builder.select_category()]
 
         except Exception as ex:
-            logging.exception("Handling Line Postback Event Error: %s", ex)
-            reply_message = ReplyMessageRequest(
-                reply_token=event.reply_token,
-                messages=[
-                    TextMessage(text='發生其他問題'), 
-                    StickerMessage(package_id='11537', sticker_id='52002770')
-                ]
-            )
+            messages = error_messages(ex)
 
         finally:
-            line_bot_api.reply_message(reply_message)
+            send_reply(line_bot_api, event.reply_token, messages)
+    else:
+        # 其他訊息
+        pass
+
+
+@csrf_exempt
+async def async_callback(request):
+    if request.method == 'POST':
+        try:
+            signature = request.headers['X-Line-Signature']
+            body = request.body.decode('utf-8')
+            payload = async_handler.parse(body, signature)
+        except (InvalidSignatureError, KeyError) as e:
+            errors_total.inc(exception=type(e).__name__)
+            return http.HttpResponseBadRequest("Invalid signature. Please check your channel access token/channel secret.")
 
+        try:
+            await async_handler.handle_async(payload)
+        finally:
+            # WSGI 下每個請求各自建立並結束事件迴圈，用戶端無法沿用，處理完即關閉
+            if not isinstance(request, ASGIRequest):
+                await async_line_api.close()
         return http.HttpResponse("OK")
+    else:
+        return http.HttpResponseNotAllowed(["POST"])
 
 
-@handler.add(MessageEvent, message=TextMessageContent)
-def handle_message(event):
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-        
-        if event.message.text == "題庫":
-            try:
-                messages = [TemplateBuilder.select_category()]
-
-            except pydantic.ValidationError as e:
-                logging.exception("Error building Line flex message template: %s", e)
-                messages=[
-                    TextMessage(text='訊息建構錯誤'),
-                    StickerMessage(package_id='11537', sticker_id='52002749')
-                ]
-
-            except Exception as ex:
-                messages=[
-                    TextMessage(text='發生其他問題'), 
-                    StickerMessage(package_id='11537', sticker_id='52002770')
-                ]
-
-            finally:
-                line_bot_api.reply_message(
-                    ReplyMessageRequest(
-                        reply_token=event.reply_token,
-                        messages=messages
-                    )
-                )
-        else:
-            # 其他訊息
-            pass
\ No newline at end of file
+@async_handler.add(PostbackEvent)
+async def handle_postback_message_async(event):
+    line_bot_api = async_line_api.get()
+
+    shed_messages = shed_postback(event)
+    if shed_messages is not None:
+        if shed_messages:
+            await send_reply_async(line_bot_api, event.reply_token, shed_messages)
+        return
+
+    try:
+        with span("profile"):
+            if profile_mode == "lazy":
+                user_profile = get_profile(line_api.get(), event.source.user_id, lazy=True)
+            else:
+                user_profile = await get_profile_async(line_bot_api, event.source.user_id)
+
+        # 題庫查詢與訊息建構會阻塞，交由執行緒池處理
+        messages = await sync_to_async(build_postback_messages, thread_sensitive=False)(event, user_profile)
+
+    except Exception as ex:
+        messages = error_messages(ex)
+
+    await send_reply_async(line_bot_api, event.reply_token, messages)
+
+
+@async_handler.add(MessageEvent, message=TextMessageContent)
+async def handle_message_async(event):
+    if event.message.text == "題庫":
+        line_bot_api = async_line_api.get()
+
+        try:
+            messages = [await sync_to_async(builder.select_category, thread_sensitive=False)()]
+
+        except Exception as ex:
+            messages = error_messages(ex)
+
+        await send_reply_async(line_bot_api, event.reply_token, messages)
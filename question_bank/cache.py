@@ -0,0 +1,127 @@
+import threading
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+
+class TTLCache:
+    """執行緒安全的 LRU 快取，項目超過 ttl 秒即失效"""
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = 300, timer: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError(f"maxsize must be positive: {maxsize}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self._loading = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return _MISSING
+
+        expires, value = item
+        if expires is not None and expires <= self.timer():
+            del self._data[key]
+            return _MISSING
+
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            expires = self.timer() + self.ttl if self.ttl is not None else None
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def add(self, key: Hashable, value: Any = True) -> bool:
+        """key 不存在 (或已過期) 時才寫入，回傳是否寫入"""
+        with self._lock:
+            if self._lookup(key) is not _MISSING:
+                self.hits += 1
+                return False
+            self.misses += 1
+            self.set(key, value)
+            return True
+
+    def get_or_set(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # 同一個 key 只讓一個執行緒載入，其餘等待結果
+        with key_lock:
+            with self._lock:
+                value = self._lookup(key)
+                if value is not _MISSING:
+                    self.hits += 1
+                    return value
+                self.misses += 1
+
+            try:
+                value = loader()
+                self.set(key, value)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._data),
+                maxsize=self.maxsize
+            )
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,44 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from question_bank.models import Category, Subject
+
+
+# 快取用的唯讀資料，脫離 Session 後仍可安全共用
+@dataclass(frozen=True)
+class CategoryRecord:
+    category_id: int
+    name: str
+    background_image: Optional[str]
+
+    @classmethod
+    def from_model(cls, category: Category) -> "CategoryRecord":
+        return cls(
+            category_id=category.category_id,
+            name=category.name,
+            background_image=category.background_image
+        )
+
+
+@dataclass(frozen=True)
+class SubjectRecord:
+    subject_id: int
+    category_id: int
+    name: str
+    description: str
+    background_image: Optional[str]
+    category: CategoryRecord
+    # 題目數量，由載入科目時的 COUNT(*) 取得，與科目一同快取
+    question_count: int
+
+    @classmethod
+    def from_model(cls, subject: Subject, question_count: int) -> "SubjectRecord":
+        return cls(
+            subject_id=subject.subject_id,
+            category_id=subject.category_id,
+            name=subject.name,
+            description=subject.description,
+            background_image=subject.background_image,
+            category=CategoryRecord.from_model(subject.category),
+            question_count=question_count
+        )
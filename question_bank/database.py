@@ -1,162 +1,378 @@
 import random
-import re
-import math
 import os
 import time
+import threading
 import traceback
-import hashlib
 
-from typing import List
-from copy import deepcopy
+from typing import Dict, Iterator, List, Tuple, Union
+from dataclasses import replace
+from contextlib import contextmanager
 
 from question_bank.models import (
-    Base,
     Category,
     Subject,
     Question
 )
 
-from question_bank.exception import CategoryNotFoundError, SubjectNotFoundError
+from question_bank.cache import TTLCache
+from question_bank.catalog import CategoryRecord, SubjectRecord
+from question_bank.deck import QuestionCard, QuestionDeck
+from question_bank.exception import CategoryNotFoundError, SubjectNotFoundError, QuestionNotFoundError
+from question_bank.expression import compile_expression, evaluate, expression_namespace, validate_variable_name
+from question_bank.metrics import query_seconds
+from question_bank.snapshot import snapshot_url
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, subqueryload
-from sqlalchemy.exc import OperationalError
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session as OrmSession, scoped_session, sessionmaker, joinedload, subqueryload, selectinload
 
 
+# 題庫快照 (manage.py export_snapshot 產生的 SQLite 檔)，設定時唯讀開啟快照，不連線至 connectString
+SNAPSHOT_PATH = os.environ.get("question_bank_snapshot")
+
 # 資料庫連接字串
-DATABASE_URL = os.environ.get("connectString")
+DATABASE_URL = snapshot_url(SNAPSHOT_PATH) if SNAPSHOT_PATH else os.environ.get("connectString")
+
+
+def engine_options(url) -> Dict:
+    options = {
+        "pool_pre_ping": os.environ.get("db_pool_pre_ping", "true").lower() in ("1", "true", "yes"),
+        "pool_recycle": int(os.environ.get("db_pool_recycle", 1800)),
+    }
+    # SQLite 使用單檔連線池，不支援以下參數
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=int(os.environ.get("db_pool_size", 5)),
+            max_overflow=int(os.environ.get("db_max_overflow", 10)),
+            pool_timeout=float(os.environ.get("db_pool_timeout", 30)),
+        )
+    return options
+
+
+class PoolStatistics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+
+    def attach(self, engine) -> None:
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "checked_out": self.checkouts - self.checkins,
+            }
+
+
+pool_stats = PoolStatistics()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+# 建立連線階段 (每個執行緒各自一個 Session)，引擎於第一次使用時才綁定
+Session = scoped_session(sessionmaker(expire_on_commit=False))
+
+
+def get_engine():
+    """第一次呼叫時才建立引擎 (不會連線，也不會建立資料表，請使用 manage.py initdb)"""
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            if not DATABASE_URL:
+                raise RuntimeError("connectString is not set")
+            engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+            pool_stats.attach(engine)
+            Session.configure(bind=engine)
+            _engine = engine
+    return _engine
+
+
+class DatabaseReadiness:
+    """背景預熱連線池並記錄資料庫是否可連線，不阻塞匯入與請求"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.ready = False
+        self.last_error = None
+        self.checked_at = None
+
+    def check(self) -> bool:
+        """立即嘗試連線一次 (會阻塞至連線逾時)"""
+        try:
+            engine = get_engine()
+            # 預先建立連線放入連線池，SQLite 只需一條
+            size = 1 if engine.dialect.name == "sqlite" else int(os.environ.get("db_pool_warmup", 1))
+            connections = [engine.connect() for _ in range(max(1, size))]
+            try:
+                connections[0].exec_driver_sql("SELECT 1")
+            finally:
+                for connection in connections:
+                    connection.close()
+        except Exception as e:
+            with self._lock:
+                self.ready, self.last_error, self.checked_at = False, f"{type(e).__name__}: {e}", time.time()
+            return False
+
+        with self._lock:
+            self.ready, self.last_error, self.checked_at = True, None, time.time()
+        return True
+
+    def _run(self, retries: int, interval: float) -> None:
+        for remaining in range(retries, -1, -1):
+            if self.check():
+                return
+            if remaining:
+                print(f"連線失敗，重試中... ({remaining} 次剩餘)")
+                time.sleep(interval)
+
+    def warm_up(self, retries: int = None, interval: float = None) -> threading.Thread:
+        """於背景執行緒連線，已在執行時不重複啟動"""
+        retries = int(os.environ.get("db_warmup_retries", 5)) if retries is None else retries
+        interval = float(os.environ.get("db_warmup_interval", 5)) if interval is None else interval
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, args=(retries, interval), name="question-bank-warmup", daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "last_error": self.last_error,
+                "checked_at": self.checked_at,
+                "warming_up": self._thread is not None and self._thread.is_alive(),
+            }
+
+
+readiness = DatabaseReadiness()
 
-# 建立引擎
-engine = create_engine(DATABASE_URL)
 
-retries = 5
-while retries >= 0:
+@contextmanager
+def session_scope() -> Iterator[OrmSession]:
+    get_engine()
+    session = Session()
     try:
-        # 建立模型
-        Base.metadata.create_all(engine)
-        break
-    except OperationalError as e:
-        if retries == 0:
-            raise e
-        print(f"連線失敗，重試中... ({retries} 次剩餘)")
-        retries -= 1
-        time.sleep(5)
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        # 關閉 Session 並將連線歸還連線池
+        Session.remove()
 
+# 類科、科目快取 (類科與科目極少變動)
+catalog_cache = TTLCache(
+    maxsize=int(os.environ.get("catalog_cache_size", 256)),
+    ttl=float(os.environ.get("catalog_cache_ttl", 300))
+)
+
+# 科目題目編號快取
+deck_cache = TTLCache(
+    maxsize=int(os.environ.get("deck_cache_size", 64)),
+    ttl=float(os.environ.get("deck_cache_ttl", 300))
+)
 
-# 建立連線階段
-Session = sessionmaker(bind=engine)
+# 單題內容 (含選項、答案、變數) 快取
+card_cache = TTLCache(
+    maxsize=int(os.environ.get("card_cache_size", 4096)),
+    ttl=float(os.environ.get("card_cache_ttl", 300))
+)
 
 
 class QuestionBank:
 
     @staticmethod
-    def get_categorys() -> List[Category]:
-        result = Session().query(Category).all()
-        if result:
-            return result
-        else:
-            raise CategoryNotFoundError()
+    def _load_subjects(**filters) -> Tuple[SubjectRecord, ...]:
+        with session_scope() as session:
+            # 題目數量以 GROUP BY 彙總 (直接寫入資料表的題目也會計入)，結果隨科目快取於 catalog_cache
+            question_count = (session.query(Question.subject_id.label("subject_id"), func.count().label("question_count"))
+                              .filter_by(**filters)
+                              .group_by(Question.subject_id)).subquery()
+            result = (session.query(Subject, func.coalesce(question_count.c.question_count, 0))
+                      .filter_by(**filters)
+                      .outerjoin(question_count, question_count.c.subject_id == Subject.subject_id)
+                      .options(selectinload(Subject.category))).all()
+            return tuple(SubjectRecord.from_model(subject, count) for subject, count in result)
+
+    @staticmethod
+    @query_seconds.time(query="get_categorys")
+    def get_categorys() -> Tuple[CategoryRecord, ...]:
+        def load():
+            with session_scope() as session:
+                result = session.query(Category).all()
+                if result:
+                    return tuple(CategoryRecord.from_model(category) for category in result)
+                else:
+                    raise CategoryNotFoundError()
+
+        return catalog_cache.get_or_set(("categorys",), load)
     
     @staticmethod
-    def get_subjects(*, category_id) -> List[Subject]:
-        result = Session().query(Subject).filter_by(category_id=category_id).all()
-        return result
+    @query_seconds.time(query="get_subjects")
+    def get_subjects(*, category_id) -> Tuple[SubjectRecord, ...]:
+        return catalog_cache.get_or_set(
+            ("subjects", category_id),
+            lambda: QuestionBank._load_subjects(category_id=category_id)
+        )
     
     @staticmethod
-    def get_subject(*, category_id, subject_id) -> Subject:
-        result = Session().query(Subject).filter_by(category_id=category_id, subject_id=subject_id).first()
-        if result:
-            return result
-        else:
-            raise SubjectNotFoundError()
+    @query_seconds.time(query="get_subject")
+    def get_subject(*, category_id, subject_id) -> SubjectRecord:
+        def load():
+            result = QuestionBank._load_subjects(category_id=category_id, subject_id=subject_id)
+            if result:
+                return result[0]
+            else:
+                raise SubjectNotFoundError()
+
+        return catalog_cache.get_or_set(("subject", category_id, subject_id), load)
+
+    @staticmethod
+    @query_seconds.time(query="get_deck")
+    def get_deck(*, category_id, subject_id) -> QuestionDeck:
+        def load():
+            subject = QuestionBank.get_subject(category_id=category_id, subject_id=subject_id)
+            with session_scope() as session:
+                rows = (session.query(Question.question_id)
+                        .filter_by(category_id=category_id)
+                        .filter_by(subject_id=subject_id)).all()
+            return QuestionDeck.build(
+                subject,
+                (row.question_id for row in rows),
+                lambda question_id: QuestionBank.get_card(
+                    category_id=category_id, subject_id=subject_id, question_id=question_id)
+            )
+
+        return deck_cache.get_or_set((category_id, subject_id), load)
+
+    @staticmethod
+    @query_seconds.time(query="get_card")
+    def get_card(*, category_id, subject_id, question_id) -> QuestionCard:
+        def load():
+            subject = QuestionBank.get_subject(category_id=category_id, subject_id=subject_id)
+            with session_scope() as session:
+                # 選項、答案、變數以 JOIN 一次查詢
+                question = (session.query(Question)
+                            .options(
+                                joinedload(Question.options),
+                                joinedload(Question.answer),
+                                joinedload(Question.variables)
+                              )
+                            .filter_by(category_id=category_id)
+                            .filter_by(subject_id=subject_id)
+                            .filter_by(question_id=question_id)).one_or_none()
+                if question is None:
+                    # 題目已刪除，重新載入科目的題目編號
+                    deck_cache.invalidate((category_id, subject_id))
+                    raise QuestionNotFoundError()
+                return QuestionCard.from_model(question, subject)
+
+        return card_cache.get_or_set((category_id, subject_id, question_id), load)
+
+    @staticmethod
+    @query_seconds.time(query="get_question")
+    def get_question(*, category_id, subject_id, seed, index) -> QuestionCard:
+        """以 seed 洗牌後的第 index 題，只載入該題"""
+        deck = QuestionBank.get_deck(category_id=category_id, subject_id=subject_id)
+        return deck.question_at(seed, index)
+
+    @staticmethod
+    def invalidate_catalog() -> None:
+        catalog_cache.clear()
+        deck_cache.clear()
+        card_cache.clear()
     
     @staticmethod
+    @query_seconds.time(query="get_questions")
     def get_questions(*, category_id, subject_id) -> List[Question]:
-        result = (Session().query(Question)
-                  .options(
-                      subqueryload(Question.category),
-                      subqueryload(Question.subject).subqueryload(Subject.questions),
-                      subqueryload(Question.options),
-                      subqueryload(Question.answer),
-                      subqueryload(Question.variables)
-                    )
-                  .filter_by(category_id=category_id)
-                  .filter_by(subject_id=subject_id)).all()
+        # Session 關閉後物件即脫離，所有關聯皆需預先載入
+        with session_scope() as session:
+            result = (session.query(Question)
+                      .options(
+                          subqueryload(Question.category),
+                          subqueryload(Question.subject).subqueryload(Subject.category),
+                          subqueryload(Question.options),
+                          subqueryload(Question.answer),
+                          subqueryload(Question.variables)
+                        )
+                      .filter_by(category_id=category_id)
+                      .filter_by(subject_id=subject_id)).all()
         return result
     
 
 class QuestionRandomizer:
-    def __init__(self, question, random_seed):
+    def __init__(self, question: Union[QuestionCard, Question], random_seed):
+        # ORM 物件先轉為輕量的唯讀資料，不複製整個關聯圖
+        if isinstance(question, Question):
+            question = QuestionCard.from_model(question, SubjectRecord.from_model(question.subject))
+
         self.random_seed = random_seed
-        self.question = deepcopy(question)
-        self.seed_generator = random.Random(self.random_seed + int(hashlib.md5(self.question.content.encode()).hexdigest()[:10], 16)).random
-        random.Random(self.seed_generator()).shuffle(self.question.options)
+        self.seed_generator = random.Random(self.random_seed + question.seed_salt).random
+
+        options = list(question.options)
+        random.Random(self.seed_generator()).shuffle(options)
+        self.question = replace(question, options=tuple(options))
 
     def process_variables(self):
-    
-        def randint(a, b):
-            return random.Random(self.seed_generator()).randint(a, b)
-
-        def uniform(a, b):
-            return random.Random(self.seed_generator()).uniform(a, b)
-
-        def uniform_r(a, b, ndigits):
-            return round(uniform(a, b), ndigits)
-
-        def choice(seq):
-            return random.Random(self.seed_generator()).choice(seq)
-
-        safe_function = [
-            "acos", "asin", "atan", "atan2", "ceil", "cos", "cosh", "degrees",
-            "e", "exp", "fabs", "floor", "fmod", "frexp", "hypot", "ldexp",
-            "log", "log10", "modf", "pi", "pow", "radians", "sin", "sinh",
-            "sqrt", "tan", "tanh"
-        ]
-        safe_dict = dict([(f, getattr(math, f)) for f in safe_function])
-        safe_dict.update(
-            abs=abs,
-            max=max,
-            min=min,
-            round=round,
-            randint=randint,
-            uniform=uniform,
-            choice=choice,
-            uniform_r=uniform_r
-        )
+        namespace = expression_namespace(self.seed_generator)
 
-        dangerous_keywords = ['__import__', 'eval', 'exec', 'open', 'os', 'sys', 'subprocess', '__']
-        dangerous_chars = [';', '&', '|', '$', '`', '{', '}', '[', ']']
-            
+        variables = []
         for variable in self.question.variables:
-            try:
-                # 確認變數名稱符合命名規則 
-                if not re.fullmatch(r"^(?!.*__)[a-zA-Z_][a-zA-Z0-9_]*$", variable.variable_name):
-                    raise ValueError(f"Invalid variable name: '{variable.variable_name}'. Variable names must start with a letter or underscore, contain only letters, digits, or underscores, and must not contain double underscores '__'.")
-
-                value = variable.variable_value
-
-                # 替換或刪除危險關鍵字
-                for keyword in dangerous_keywords:
-                    value = re.sub(r'\b' + keyword + r'\b', '', value)
-                
-                # 刪除危險字符
-                for char in dangerous_chars:
-                    value = value.replace(char, '')
+            # 確認變數名稱符合命名規則 
+            validate_variable_name(variable.variable_name)
 
-                # 禁止存取屬性
-                value = re.sub(r'(?<!\d)\.(?!\d)', '', value)
-
-                variable.variable_value = eval(value, {"__builtins__": None}, safe_dict)
+            try:
+                value = evaluate(compile_expression(variable.variable_value), namespace)
             except (SyntaxError, NameError, TypeError):
                 raise ValueError(f"Invalid variable value: '{variable.variable_value}'.")
 
+            variables.append(replace(variable, variable_value=value))
+
+        self.question = replace(self.question, variables=tuple(variables))
+
         try:
             variable_map = dict((variable.variable_name, variable.variable_value) for variable in self.question.variables)
             
-            self.question.content = self.question.content.format(**variable_map)
+            self.question = replace(self.question, content=self.question.content.format(**variable_map))
 
-            for option in self.question.options:
-                option.content = option.content.format(**variable_map)
+            self.question = replace(self.question, options=tuple(
+                replace(option, content=option.content.format(**variable_map)) for option in self.question.options
+            ))
 
         except (KeyError, ValueError):
             traceback.print_exc()
\ No newline at end of file
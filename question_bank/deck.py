@@ -0,0 +1,100 @@
+import hashlib
+
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, FrozenSet, Iterable, Tuple
+
+from question_bank.catalog import CategoryRecord, SubjectRecord
+from question_bank.models import Question
+from question_bank.permutation import seeded_position
+
+
+@dataclass(frozen=True)
+class OptionCard:
+    option_id: int
+    content: str
+
+
+@dataclass(frozen=True)
+class VariableCard:
+    variable_name: str
+    variable_value: Any
+
+
+@dataclass(frozen=True)
+class QuestionCard:
+    question_id: int
+    category_id: int
+    subject_id: int
+    content: str
+    options: Tuple[OptionCard, ...]
+    answer_ids: FrozenSet[int]
+    variables: Tuple[VariableCard, ...]
+    # 題目亂數種子的偏移量 (題目內容的 md5)
+    seed_salt: int
+    category: CategoryRecord
+    subject: SubjectRecord
+
+    @classmethod
+    def from_model(cls, question: Question, subject: SubjectRecord) -> "QuestionCard":
+        return cls(
+            question_id=question.question_id,
+            category_id=question.category_id,
+            subject_id=question.subject_id,
+            content=question.content,
+            options=tuple(
+                OptionCard(option_id=option.option_id, content=option.content)
+                for option in sorted(question.options, key=lambda o: o.option_id)
+            ),
+            answer_ids=frozenset(answer.option_id for answer in question.answer),
+            variables=tuple(
+                VariableCard(variable_name=variable.variable_name, variable_value=variable.variable_value)
+                for variable in question.variables
+            ),
+            seed_salt=int(hashlib.md5(question.content.encode()).hexdigest()[:10], 16),
+            category=subject.category,
+            subject=subject
+        )
+
+
+@dataclass(frozen=True)
+class QuestionDeck:
+    """單一科目依 question_id 排序的題目編號，題目內容在使用時才逐題載入"""
+
+    category_id: int
+    subject_id: int
+    subject: SubjectRecord
+    question_ids: Tuple[int, ...]
+    load_card: Callable[[int], QuestionCard] = field(repr=False, compare=False)
+
+    @classmethod
+    def build(cls, subject: SubjectRecord, question_ids: Iterable[int], load_card: Callable[[int], QuestionCard]) -> "QuestionDeck":
+        question_ids = tuple(sorted(question_ids))
+        # 科目與題目編號分別快取，兩者載入之間新增、刪除的題目會使數量不一致，
+        # 題目數量以實際的題目編號為準
+        if subject.question_count != len(question_ids):
+            subject = replace(subject, question_count=len(question_ids))
+        return cls(
+            category_id=subject.category_id,
+            subject_id=subject.subject_id,
+            subject=subject,
+            question_ids=question_ids,
+            load_card=load_card
+        )
+
+    def question_id_at(self, seed: int, index: int) -> int:
+        """以 seed 洗牌後第 index 題的 question_id"""
+        return self.question_ids[seeded_position(len(self.question_ids), seed, index)]
+
+    def question_at(self, seed: int, index: int) -> QuestionCard:
+        """以 seed 洗牌後的第 index 題"""
+        return self.card(self.question_id_at(seed, index))
+
+    def card(self, question_id: int) -> QuestionCard:
+        card = self.load_card(question_id)
+        # 題目顯示的題數與牌組一致
+        if card.subject != self.subject:
+            card = replace(card, subject=self.subject)
+        return card
+
+    def __len__(self):
+        return len(self.question_ids)
@@ -8,3 +8,15 @@ class CategoryNotFoundError(QuestionBankException):
 
 class SubjectNotFoundError(QuestionBankException):
     pass
+
+
+class QuestionNotFoundError(QuestionBankException):
+    pass
+
+
+class ImportRecordError(QuestionBankException):
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
@@ -0,0 +1,160 @@
+import ast
+import math
+import os
+import random
+import re
+
+from functools import lru_cache
+from types import CodeType
+from typing import Callable, Dict
+
+
+# 變數名稱：英文字母或底線開頭，不得包含 "__"
+VARIABLE_NAME_PATTERN = re.compile(r"^(?!.*__)[a-zA-Z_][a-zA-Z0-9_]*$")
+
+SAFE_MATH = [
+    "acos", "asin", "atan", "atan2", "ceil", "cos", "cosh", "degrees",
+    "e", "exp", "fabs", "floor", "fmod", "frexp", "hypot", "ldexp",
+    "log", "log10", "modf", "pi", "pow", "radians", "sin", "sinh",
+    "sqrt", "tan", "tanh"
+]
+
+SAFE_NAMESPACE = dict([(f, getattr(math, f)) for f in SAFE_MATH])
+SAFE_NAMESPACE.update(
+    abs=abs,
+    max=max,
+    min=min,
+    round=round,
+)
+
+# 依題目亂數種子產生結果的函式，每次算繪重新建立
+SEEDED_FUNCTIONS = ("randint", "uniform", "uniform_r", "choice")
+
+ALLOWED_NAMES = frozenset(SAFE_NAMESPACE) | frozenset(SEEDED_FUNCTIONS)
+
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.Constant,
+    ast.Name,
+    ast.Load,
+    ast.Tuple,
+    ast.Call,
+    ast.keyword,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.BoolOp,
+    ast.Compare,
+    ast.IfExp,
+    ast.operator,
+    ast.unaryop,
+    ast.boolop,
+    ast.cmpop,
+)
+
+# 結果可能無限放大的運算子：次方 (9**9**9**9) 與左移請改用有上限的 math.pow
+UNBOUNDED_OPERATORS = (ast.Pow, ast.LShift)
+
+
+class ExpressionValidator(ast.NodeVisitor):
+
+    def __init__(self, source: str):
+        self.source = source
+
+    def generic_visit(self, node):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Invalid variable value: '{self.source}'. '{type(node).__name__}' is not allowed.")
+        super().generic_visit(node)
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (int, float, str)):
+            raise ValueError(f"Invalid variable value: '{self.source}'. Constant {node.value!r} is not allowed.")
+
+    def visit_Name(self, node):
+        if node.id not in ALLOWED_NAMES:
+            raise ValueError(f"Invalid variable value: '{self.source}'. Name '{node.id}' is not allowed.")
+
+    def visit_Call(self, node):
+        # 只允許直接呼叫白名單函式，不接受 *args / **kwargs
+        if not isinstance(node.func, ast.Name):
+            raise ValueError(f"Invalid variable value: '{self.source}'. Only plain calls to allowed functions are permitted.")
+        if any(isinstance(arg, ast.Starred) for arg in node.args) or any(keyword.arg is None for keyword in node.keywords):
+            raise ValueError(f"Invalid variable value: '{self.source}'. Argument unpacking is not allowed.")
+        self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        if isinstance(node.op, UNBOUNDED_OPERATORS):
+            raise ValueError(f"Invalid variable value: '{self.source}'. Operator '{type(node.op).__name__}' is not allowed, use pow() instead.")
+        # 字串、tuple 乘上整數會依倍數配置記憶體 ('x' * 10000000000)
+        if isinstance(node.op, ast.Mult) and (self.may_be_sequence(node.left) or self.may_be_sequence(node.right)):
+            raise ValueError(f"Invalid variable value: '{self.source}'. Repeating strings or tuples is not allowed.")
+        # 格式化字串的寬度同樣不受限制 ('%0999999999d' % 1)，與 f-string 一樣不允許
+        if isinstance(node.op, ast.Mod) and self.may_be_sequence(node.left):
+            raise ValueError(f"Invalid variable value: '{self.source}'. String formatting is not allowed.")
+        self.generic_visit(node)
+
+    @classmethod
+    def may_be_sequence(cls, node) -> bool:
+        """運算結果是否可能為字串或 tuple"""
+        if isinstance(node, ast.Constant):
+            return isinstance(node.value, str)
+        if isinstance(node, ast.Tuple):
+            return True
+        if isinstance(node, ast.Call):
+            # choice、max、min 回傳參數 (或單一 tuple 參數) 中的元素，其餘函式回傳數值
+            if not isinstance(node.func, ast.Name) or node.func.id not in ("choice", "max", "min"):
+                return False
+            if len(node.args) == 1 and isinstance(node.args[0], ast.Tuple):
+                return any(cls.may_be_sequence(element) for element in node.args[0].elts)
+            return any(cls.may_be_sequence(arg) for arg in node.args)
+        if isinstance(node, ast.IfExp):
+            return cls.may_be_sequence(node.body) or cls.may_be_sequence(node.orelse)
+        if isinstance(node, ast.BoolOp):
+            return any(cls.may_be_sequence(value) for value in node.values)
+        if isinstance(node, ast.BinOp):
+            return cls.may_be_sequence(node.left) or cls.may_be_sequence(node.right)
+        return False
+
+
+def validate_variable_name(name: str) -> None:
+    if not VARIABLE_NAME_PATTERN.fullmatch(name):
+        raise ValueError(f"Invalid variable name: '{name}'. Variable names must start with a letter or underscore, contain only letters, digits, or underscores, and must not contain double underscores '__'.")
+
+
+@lru_cache(maxsize=int(os.environ.get("expression_cache_size", 4096)))
+def compile_expression(source: str) -> CodeType:
+    """解析並驗證變數運算式，回傳可重複使用的 code object"""
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError:
+        raise ValueError(f"Invalid variable value: '{source}'.")
+
+    ExpressionValidator(source).visit(tree)
+    return compile(tree, "<variable>", "eval")
+
+
+def expression_namespace(seed_generator: Callable[[], float]) -> Dict[str, object]:
+
+    def randint(a, b):
+        return random.Random(seed_generator()).randint(a, b)
+
+    def uniform(a, b):
+        return random.Random(seed_generator()).uniform(a, b)
+
+    def uniform_r(a, b, ndigits):
+        return round(uniform(a, b), ndigits)
+
+    def choice(seq):
+        return random.Random(seed_generator()).choice(seq)
+
+    namespace = dict(SAFE_NAMESPACE)
+    namespace.update(
+        randint=randint,
+        uniform=uniform,
+        choice=choice,
+        uniform_r=uniform_r
+    )
+    return namespace
+
+
+def evaluate(code: CodeType, namespace: Dict[str, object]):
+    return eval(code, {"__builtins__": {}}, namespace)
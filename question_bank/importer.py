@@ -0,0 +1,416 @@
+import csv
+import hashlib
+import io
+import json
+import random
+import re
+import time
+
+from dataclasses import dataclass, fields
+from string import Formatter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func, insert
+
+from question_bank.database import session_scope
+from question_bank.exception import ImportRecordError
+from question_bank.expression import compile_expression, evaluate, expression_namespace, validate_variable_name
+from question_bank.models import (
+    Category,
+    Subject,
+    Question,
+    QuestionOption,
+    QuestionAnswer,
+    QuestionVariable
+)
+
+
+# 作答紀錄以 "ABCDE" 記錄選項 (見 QuestionPostback.ReplyAnswer)
+MAX_OPTIONS = 5
+
+# (行號, 正規化後的資料)
+Record = Tuple[int, Dict]
+
+
+def _column_length(column) -> Optional[int]:
+    return getattr(column.type, "length", None)
+
+
+def _to_int(value, name: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be an integer: {value!r}")
+
+
+def _optional(value) -> Optional[str]:
+    return value if value not in (None, "") else None
+
+
+def normalize(raw: Dict) -> Dict:
+    """
+    將 CSV 列或 JSONL 物件轉為統一格式：
+
+        category: category_id, name, background_image
+        subject:  subject_id, category_id, name, description, background_image
+        question: question_id (可省略), category_id, subject_id, content,
+                  options [str], answers [選項序號，從 1 開始], variables {名稱: 運算式}
+
+    CSV 的選項為 option_1 ~ option_5 欄，答案以逗號分隔，變數為 var_<名稱> 欄。
+    """
+    record_type = (raw.get("type") or "question").strip().lower()
+
+    if record_type == "category":
+        return {
+            "type": record_type,
+            "category_id": _to_int(raw.get("category_id"), "category_id"),
+            "name": raw.get("name") or "",
+            "background_image": _optional(raw.get("background_image")),
+        }
+
+    if record_type == "subject":
+        return {
+            "type": record_type,
+            "subject_id": _to_int(raw.get("subject_id"), "subject_id"),
+            "category_id": _to_int(raw.get("category_id"), "category_id"),
+            "name": raw.get("name") or "",
+            "description": raw.get("description") or "",
+            "background_image": _optional(raw.get("background_image")),
+        }
+
+    if record_type != "question":
+        raise ValueError(f"Unknown record type: {record_type!r}")
+
+    options = raw.get("options")
+    if options is None:
+        columns = sorted(
+            (int(key[len("option_"):]), value) for key, value in raw.items()
+            if re.fullmatch(r"option_\d+", key or "") and value not in (None, "")
+        )
+        options = [value for _, value in columns]
+
+    answers = raw.get("answers", raw.get("answer"))
+    if isinstance(answers, str):
+        answers = [answer for answer in re.split(r"[,;\s]+", answers) if answer]
+    elif not isinstance(answers, list):
+        answers = [answers] if answers is not None else []
+
+    variables = raw.get("variables")
+    if variables is None:
+        variables = {
+            key[len("var_"):]: value for key, value in raw.items()
+            if (key or "").startswith("var_") and value not in (None, "")
+        }
+
+    return {
+        "type": record_type,
+        "question_id": _to_int(raw["question_id"], "question_id") if _optional(raw.get("question_id")) is not None else None,
+        "category_id": _to_int(raw.get("category_id"), "category_id"),
+        "subject_id": _to_int(raw.get("subject_id"), "subject_id"),
+        "content": raw.get("content") or "",
+        "options": [str(option) for option in options],
+        "answers": [_to_int(answer, "answers") for answer in answers],
+        "variables": {str(name): str(value) for name, value in variables.items()},
+    }
+
+
+def read_records(path: str, file_format: Optional[str] = None, errors: Optional[List[ImportRecordError]] = None) -> Iterator[Record]:
+    """
+    逐行讀取題庫檔 (CSV 或 JSONL)，不會一次載入整個檔案；
+    指定 errors 時格式錯誤的資料加入 errors 後略過，否則拋出 ImportRecordError
+    """
+    file_format = file_format or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    if file_format not in ("csv", "jsonl"):
+        raise ValueError(f"Unknown file format: {file_format}")
+
+    with io.open(path, encoding="utf-8-sig", newline="") as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            rows = ((reader.line_num, row) for row in reader)
+        else:
+            rows = ((line, text) for line, text in enumerate(file, start=1) if text.strip())
+
+        for line, row in rows:
+            try:
+                yield line, normalize(row if file_format == "csv" else json.loads(row))
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                error = ImportRecordError(line, str(e))
+                if errors is None:
+                    raise error
+                errors.append(error)
+
+
+def placeholders(template: str) -> Iterator[str]:
+    """回傳 str.format 使用的變數名稱，格式錯誤時拋出 ValueError"""
+    for _, field_name, format_spec, _ in Formatter().parse(template):
+        if field_name is None:
+            continue
+        if field_name == "" or field_name.isdigit():
+            raise ValueError(f"Positional placeholder '{{{field_name}}}' is not allowed: '{template}'")
+        yield re.split(r"[.\[]", field_name, 1)[0]
+        if format_spec:
+            yield from placeholders(format_spec)
+
+
+class BankValidator:
+    """匯入前檢查每筆資料，包含變數運算式與題目、選項中的 {} 變數"""
+
+    def __init__(self, categories: Iterable[int] = (), subjects: Optional[Dict[int, int]] = None, question_ids: Iterable[int] = ()):
+        self.categories: Set[int] = set(categories)
+        # subject_id -> category_id
+        self.subjects: Dict[int, int] = dict(subjects or {})
+        # 資料庫中已存在的題目編號 / 檔案中指定的題目編號
+        self.existing_question_ids: Set[int] = set(question_ids)
+        self.question_ids: Set[int] = set()
+
+    @staticmethod
+    def _check_length(value: Optional[str], column, name: str) -> None:
+        length = _column_length(column)
+        if value is not None and length is not None and len(value) > length:
+            raise ValueError(f"'{name}' is longer than {length} characters: '{value[:20]}...'")
+
+    def validate(self, record: Dict) -> None:
+        validate = getattr(self, f"validate_{record['type']}")
+        validate(record)
+
+    def validate_category(self, record: Dict) -> None:
+        if not record["name"]:
+            raise ValueError("Category name is required")
+        self._check_length(record["name"], Category.name, "name")
+        self._check_length(record["background_image"], Category.background_image, "background_image")
+        self.categories.add(record["category_id"])
+
+    def validate_subject(self, record: Dict) -> None:
+        if record["category_id"] not in self.categories:
+            raise ValueError(f"Unknown category_id: {record['category_id']}")
+        if not record["name"]:
+            raise ValueError("Subject name is required")
+        existing = self.subjects.get(record["subject_id"])
+        if existing is not None and existing != record["category_id"]:
+            raise ValueError(f"Subject {record['subject_id']} already belongs to category {existing}")
+        self._check_length(record["name"], Subject.name, "name")
+        self._check_length(record["description"], Subject.description, "description")
+        self._check_length(record["background_image"], Subject.background_image, "background_image")
+        self.subjects[record["subject_id"]] = record["category_id"]
+
+    def validate_question(self, record: Dict) -> None:
+        if self.subjects.get(record["subject_id"]) != record["category_id"]:
+            raise ValueError(f"Unknown subject {record['subject_id']} in category {record['category_id']}")
+
+        question_id = record["question_id"]
+        if question_id is not None:
+            if question_id in self.existing_question_ids:
+                raise ValueError(f"question_id {question_id} already exists in the database")
+            if question_id in self.question_ids:
+                raise ValueError(f"Duplicate question_id: {question_id}")
+            self.question_ids.add(question_id)
+
+        if not record["content"]:
+            raise ValueError("Question content is required")
+        self._check_length(record["content"], Question.content, "content")
+
+        options = record["options"]
+        if not 2 <= len(options) <= MAX_OPTIONS:
+            raise ValueError(f"A question needs 2 to {MAX_OPTIONS} options, got {len(options)}")
+        for option in options:
+            self._check_length(option, QuestionOption.content, "option")
+
+        answers = record["answers"]
+        if not answers:
+            raise ValueError("At least one answer is required")
+        for answer in answers:
+            if not 1 <= answer <= len(options):
+                raise ValueError(f"Answer {answer} does not match any option")
+
+        # 以固定種子試算一次，確認運算式可執行、題目與選項可以套用變數
+        namespace = expression_namespace(random.Random(0).random)
+        values = {}
+        for name, source in record["variables"].items():
+            validate_variable_name(name)
+            self._check_length(name, QuestionVariable.variable_name, "variable name")
+            self._check_length(source, QuestionVariable.variable_value, "variable value")
+            try:
+                values[name] = evaluate(compile_expression(source), namespace)
+            except ValueError:
+                raise
+            except Exception as e:
+                raise ValueError(f"Variable '{name}' failed to evaluate: {type(e).__name__}: {e}")
+
+        for template in [record["content"], *options]:
+            for name in placeholders(template):
+                if name not in values:
+                    raise ValueError(f"Undefined variable '{name}' in '{template}'")
+            try:
+                template.format(**values)
+            except (IndexError, KeyError, AttributeError, TypeError, ValueError) as e:
+                raise ValueError(f"Cannot format '{template}': {type(e).__name__}: {e}")
+
+
+@dataclass
+class ImportStats:
+    categories: int = 0
+    subjects: int = 0
+    questions: int = 0
+    options: int = 0
+    answers: int = 0
+    variables: int = 0
+    # 資料庫中已存在而略過的類科、科目
+    skipped: int = 0
+    # 未指定 question_id，且題目與選項和同科目中的題目 (資料庫或檔案中較前面的資料) 相同而略過的題目
+    duplicates: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+
+class BankImporter:
+    """以 executemany 批次寫入，每 batch_size 題一個交易"""
+
+    def __init__(self, batch_size: int = 1000, progress: Callable[[ImportStats, int, float], None] = None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.stats = ImportStats()
+        # (category_id, subject_id) -> 題目指紋
+        self.fingerprints: Dict[Tuple[int, int], Set[str]] = {}
+
+    @staticmethod
+    def existing_subjects() -> Tuple[Set[int], Dict[int, int]]:
+        """資料庫中的類科與科目 (subject_id -> category_id)"""
+        with session_scope() as session:
+            categories = {row.category_id for row in session.query(Category.category_id)}
+            subjects = {row.subject_id: row.category_id for row in session.query(Subject.subject_id, Subject.category_id)}
+        return categories, subjects
+
+    @staticmethod
+    def existing_catalog() -> Tuple[Set[int], Dict[int, int], Set[int]]:
+        """類科、科目與所有題目編號，供 BankValidator 檢查指定的 question_id"""
+        categories, subjects = BankImporter.existing_subjects()
+        with session_scope() as session:
+            question_ids = {row.question_id for row in session.query(Question.question_id)}
+        return categories, subjects, question_ids
+
+    @staticmethod
+    def fingerprint(content: str, options: Iterable[str]) -> str:
+        """題目內容與依序排列的選項"""
+        return hashlib.md5("\x1f".join([content, *options]).encode()).hexdigest()
+
+    @staticmethod
+    def existing_fingerprints(category_id: int, subject_id: int) -> Set[str]:
+        with session_scope() as session:
+            rows = (session.query(Question.question_id, Question.content, QuestionOption.content.label("option"))
+                    .join(QuestionOption, QuestionOption.question_id == Question.question_id)
+                    .filter(Question.category_id == category_id, Question.subject_id == subject_id)
+                    .order_by(Question.question_id, QuestionOption.option_id)).all()
+
+        questions: Dict[int, List[str]] = {}
+        for row in rows:
+            questions.setdefault(row.question_id, [row.content]).append(row.option)
+        return {BankImporter.fingerprint(content, options) for content, *options in questions.values()}
+
+    def is_duplicate(self, record: Dict) -> bool:
+        """
+        未指定 question_id 的題目與同科目中的題目相同時視為重複 (例如重新匯入同一個檔案)，
+        各科目第一次出現時才載入既有題目
+        """
+        key = (record["category_id"], record["subject_id"])
+        fingerprints = self.fingerprints.get(key)
+        if fingerprints is None:
+            fingerprints = self.fingerprints[key] = self.existing_fingerprints(*key)
+
+        fingerprint = self.fingerprint(record["content"], record["options"])
+        if fingerprint in fingerprints:
+            return True
+        fingerprints.add(fingerprint)
+        return False
+
+    def run(self, records: Iterable[Record]) -> ImportStats:
+        # 寫入時只需略過已存在的類科、科目，不需載入所有題目編號
+        categories, subjects = self.existing_subjects()
+        with session_scope() as session:
+            next_question_id = (session.query(func.max(Question.question_id)).scalar() or 0) + 1
+
+        started = time.perf_counter()
+        batch: Dict[str, List[Dict]] = self._new_batch()
+        line = 0
+
+        for line, record in records:
+            record_type = record.pop("type")
+
+            if record_type == "category":
+                if record["category_id"] in categories:
+                    self.stats.skipped += 1
+                    continue
+                categories.add(record["category_id"])
+                batch["categories"].append(record)
+
+            elif record_type == "subject":
+                if record["subject_id"] in subjects:
+                    self.stats.skipped += 1
+                    continue
+                subjects[record["subject_id"]] = record["category_id"]
+                batch["subjects"].append(record)
+
+            else:
+                question_id = record["question_id"]
+                if question_id is None:
+                    if self.is_duplicate(record):
+                        self.stats.duplicates += 1
+                        continue
+                    question_id = next_question_id
+                next_question_id = max(next_question_id, question_id + 1)
+                self._add_question(batch, question_id, record)
+
+                if len(batch["questions"]) >= self.batch_size:
+                    self._flush(batch, line, started)
+                    batch = self._new_batch()
+
+        self._flush(batch, line, started)
+        return self.stats
+
+    @staticmethod
+    def _new_batch() -> Dict[str, List[Dict]]:
+        return {"categories": [], "subjects": [], "questions": [], "options": [], "answers": [], "variables": []}
+
+    @staticmethod
+    def _add_question(batch: Dict[str, List[Dict]], question_id: int, record: Dict) -> None:
+        batch["questions"].append({
+            "question_id": question_id,
+            "category_id": record["category_id"],
+            "subject_id": record["subject_id"],
+            "content": record["content"],
+        })
+        batch["options"].extend({
+            "option_id": option_id,
+            "question_id": question_id,
+            "content": content
+        } for option_id, content in enumerate(record["options"], start=1))
+        batch["answers"].extend({
+            "question_id": question_id,
+            "option_id": option_id
+        } for option_id in sorted(set(record["answers"])))
+        batch["variables"].extend({
+            "question_id": question_id,
+            "variable_name": name,
+            "variable_value": value
+        } for name, value in record["variables"].items())
+
+    def _flush(self, batch: Dict[str, List[Dict]], line: int, started: float) -> None:
+        if not any(batch.values()):
+            return
+
+        with session_scope() as session:
+            # 依外鍵順序寫入
+            for key, model in (
+                ("categories", Category),
+                ("subjects", Subject),
+                ("questions", Question),
+                ("options", QuestionOption),
+                ("answers", QuestionAnswer),
+                ("variables", QuestionVariable),
+            ):
+                if batch[key]:
+                    session.execute(insert(model), batch[key])
+                    setattr(self.stats, key, getattr(self.stats, key) + len(batch[key]))
+
+        if self.progress is not None:
+            self.progress(self.stats, line, time.perf_counter() - started)
@@ -0,0 +1,268 @@
+import os
+import threading
+import time
+
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from question_bank.cache import CacheStats
+
+
+# 設為 false 時 span 不計時 (計數器仍會累計)
+metrics_enabled = os.environ.get("metrics_enabled", "true").lower() in ("1", "true", "yes")
+
+# 單位為秒，涵蓋快取命中 (< 1ms) 到冷啟動查詢
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# (名稱, 標籤, 數值)
+Sample = Tuple[str, Mapping[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Mapping[str, str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        self._observe_key(self._key(labels), value)
+
+    def time(self, **labels) -> "Timer":
+        """計時區塊，也可作為裝飾器使用"""
+        return Timer(self, self._key(labels))
+
+    def _observe_key(self, key: Tuple[str, ...], value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各區間次數 (最後一格為 +Inf), 總和, 次數]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+
+        for key, counts, total, count in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class Timer:
+    """Histogram.time() 的計時器，標籤在建立時解析以降低每次計時的成本"""
+
+    __slots__ = ("histogram", "key", "start")
+
+    def __init__(self, histogram: Histogram, key: Tuple[str, ...]):
+        self.histogram = histogram
+        self.key = key
+        self.start = 0.0
+
+    def __enter__(self):
+        if metrics_enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if metrics_enabled:
+            self.histogram._observe_key(self.key, time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, func):
+        histogram, key = self.histogram, self.key
+
+        # 作為裝飾器時每次呼叫使用新的計時器，可重入、跨執行緒
+        @wraps(func)
+        def timed(*args, **kwargs):
+            with Timer(histogram, key):
+                return func(*args, **kwargs)
+        return timed
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+        # 輸出時才取值的外部統計 (快取、連線池等)
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]) -> None:
+        """collector 回傳 (名稱, 類型, 說明, samples) 的序列"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """輸出 Prometheus text format (0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        families = [(metric.name, metric.type, metric.documentation, list(metric.samples())) for metric in metrics]
+        for collector in collectors:
+            families.extend(collector())
+
+        lines = []
+        for name, metric_type, documentation, samples in families:
+            lines.append(f"# HELP {name} {_escape(documentation)}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def cache_collector(caches: Mapping[str, Callable[[], CacheStats]]):
+    """將各快取的 CacheStats 轉為 cache_* 指標"""
+
+    def collect():
+        stats = {name: get_stats() for name, get_stats in caches.items()}
+        fields = [
+            ("cache_hits_total", "counter", "Cache hits.", "hits"),
+            ("cache_misses_total", "counter", "Cache misses.", "misses"),
+            ("cache_evictions_total", "counter", "Cache evictions.", "evictions"),
+            ("cache_size", "gauge", "Current number of cached entries.", "size"),
+            ("cache_maxsize", "gauge", "Maximum number of cached entries.", "maxsize"),
+        ]
+        return [
+            (name, metric_type, documentation,
+             [(name, {"cache": cache}, getattr(stat, field)) for cache, stat in stats.items()])
+            for name, metric_type, documentation, field in fields
+        ]
+
+    return collect
+
+
+def stats_collector(prefix: str, snapshot: Callable[[], Mapping[str, float]], documentation: str):
+    """將 stats() / snapshot() 回傳的 dict 轉為 gauge，名稱為 {prefix}_{key}"""
+
+    def collect():
+        return [
+            (f"{prefix}_{key}", "gauge", f"{documentation} ({key})", [(f"{prefix}_{key}", {}, value)])
+            for key, value in snapshot().items()
+        ]
+
+    return collect
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "linebot_stage_seconds",
+    "Time spent in each stage of handling a Line webhook.",
+    ("stage",)
+)
+query_seconds = registry.histogram(
+    "question_bank_query_seconds",
+    "Time spent in QuestionBank queries, including cache hits.",
+    ("query",)
+)
+payload_events = registry.histogram(
+    "linebot_payload_events",
+    "Number of events in each webhook payload.",
+    buckets=(1, 2, 5, 10, 20, 50, 100)
+)
+duplicate_events_total = registry.counter(
+    "linebot_duplicate_events_total",
+    "Webhook events skipped because their webhookEventId was already handled, by isRedelivery.",
+    ("redelivery",)
+)
+shed_requests_total = registry.counter(
+    "linebot_shed_requests_total",
+    "Postbacks dropped before reaching the question bank, by reason (coalesced, rate_limited).",
+    ("reason",)
+)
+errors_total = registry.counter(
+    "linebot_errors_total",
+    "Errors raised while handling Line webhooks, by exception type.",
+    ("exception",)
+)
+reply_failures_total = registry.counter(
+    "linebot_reply_failures_total",
+    "Failed reply_message calls (e.g. expired or used reply tokens), by HTTP status.",
+    ("status",)
+)
+
+
+def span(stage: str) -> Timer:
+    """計時 webhook 處理的某個階段：with span("verify"): ..."""
+    return Timer(stage_seconds, (stage,))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Index, Integer, String, ForeignKey
 from sqlalchemy.orm import declarative_base, relationship
 
 
@@ -23,6 +23,10 @@ class Category(Base):
 
 class Subject(Base):
     __tablename__ = 'Subject'
+    __table_args__ = (
+        # get_subjects: 依類科列出科目
+        Index("IX_Subject_CategoryID", "CategoryID"),
+    )
     subject_id = Column("SubjectID", Integer, primary_key=True, autoincrement=True, nullable=False)
     category_id = Column("CategoryID", ForeignKey("Category.CategoryID"), nullable=False)
     name = Column("Name", String(16), nullable=False)
@@ -41,6 +45,10 @@ class Subject(Base):
 
 class Question(Base):
     __tablename__ = "Question"
+    __table_args__ = (
+        # get_deck / get_questions: 依類科、科目查詢題目
+        Index("IX_Question_CategoryID_SubjectID", "CategoryID", "SubjectID"),
+    )
     question_id = Column("QuestionID", Integer, primary_key=True, autoincrement=True, nullable=False)
     category_id = Column("CategoryID", ForeignKey("Category.CategoryID"), nullable=False)
     subject_id = Column("SubjectID", ForeignKey("Subject.SubjectID"), nullable=False)
@@ -62,6 +70,10 @@ class Question(Base):
 
 class QuestionOption(Base):
     __tablename__ = "QuestionOption"
+    __table_args__ = (
+        # 主鍵以 OptionID 開頭，依題目載入選項需另建索引 (QuestionAnswer、QuestionVariable 的主鍵已以 QuestionID 開頭)
+        Index("IX_QuestionOption_QuestionID", "QuestionID"),
+    )
     option_id = Column("OptionID", Integer, primary_key=True, nullable=False)
     question_id = Column("QuestionID", ForeignKey("Question.QuestionID"), primary_key=True, nullable=False)
     content = Column("Content", String(256), nullable=False)
@@ -101,4 +113,4 @@ class QuestionVariable(Base):
             question_id=self.question_id,
             variable_name=self.variable_name,
             variable_value=self.variable_value
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,90 @@
+import os
+import random
+
+from typing import List
+
+from question_bank.cache import TTLCache
+
+
+# shuffle: 與舊版相同，以 random.shuffle 洗牌整個科目 (依 (題數, 種子) 快取，不會每次點擊都洗牌)
+# feistel: 直接計算第 index 題的位置，但題目順序與 shuffle 不同，
+#          已送出的 postback (聊天紀錄中的按鈕) 會對應到其他題目，只適用於全新部署
+question_order = os.environ.get("question_order", "shuffle")
+
+permutation_cache = TTLCache(
+    maxsize=int(os.environ.get("permutation_cache_size", 64)),
+    ttl=None
+)
+
+_MASK64 = (1 << 64) - 1
+
+
+class SeededPermutation:
+    """
+    以 Feistel 網路建立 [0, size) 的確定性排列，
+    查詢單一位置為 O(1)，不需產生整個排列。
+    """
+
+    rounds = 4
+
+    def __init__(self, size: int, seed: int):
+        if size <= 0:
+            raise ValueError(f"size must be positive: {size}")
+        self.size = size
+        self.seed = seed
+
+        # 定義域取不小於 size 的 2 的偶數次方，超出範圍時重複加密 (cycle walking)
+        half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.half_bits = half_bits
+        self.half_mask = (1 << half_bits) - 1
+
+        generator = random.Random(seed)
+        self.keys = [generator.getrandbits(64) for _ in range(self.rounds)]
+
+    def _round(self, value: int, key: int) -> int:
+        value = (value ^ key) * 0x9E3779B97F4A7C15 & _MASK64
+        value ^= value >> 31
+        value = value * 0xBF58476D1CE4E5B9 & _MASK64
+        value ^= value >> 29
+        return value & self.half_mask
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self.half_bits) | right
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.size:
+            raise IndexError(f"index out of range: {index}")
+
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def __len__(self):
+        return self.size
+
+
+def shuffled_positions(size: int, seed: int) -> List[int]:
+    # random.shuffle 的結果只與長度及種子有關，可依 (size, seed) 共用
+    def build():
+        positions = list(range(size))
+        random.Random(seed).shuffle(positions)
+        return positions
+
+    return permutation_cache.get_or_set(("shuffle", size, seed), build)
+
+
+def seeded_position(size: int, seed: int, index: int, order: str = None) -> int:
+    """回傳以 seed 洗牌後第 index 題在原排序中的位置"""
+    order = order or question_order
+
+    if order == "shuffle":
+        return shuffled_positions(size, seed)[index]
+    elif order == "feistel":
+        permutation = permutation_cache.get_or_set(("feistel", size, seed), lambda: SeededPermutation(size, seed))
+        return permutation[index]
+    else:
+        raise ValueError(f"Unknown question order: {order}")
@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+from typing import Callable, Dict
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.schema import CreateTable
+
+from question_bank.models import (
+    Category,
+    Subject,
+    Question,
+    QuestionOption,
+    QuestionAnswer,
+    QuestionVariable
+)
+
+
+# 依外鍵順序匯出
+SNAPSHOT_TABLES = (
+    Category.__table__,
+    Subject.__table__,
+    Question.__table__,
+    QuestionOption.__table__,
+    QuestionAnswer.__table__,
+    QuestionVariable.__table__,
+)
+
+def snapshot_url(path: str) -> str:
+    """以唯讀、不檢查檔案變動 (immutable) 的方式開啟快照"""
+    return f"sqlite:///file:{os.path.abspath(path).replace(os.sep, '/')}?mode=ro&immutable=1&uri=true"
+
+
+def export_snapshot(source_engine, path: str, batch_size: int = 5000, progress: Callable[[str, int], None] = None) -> Dict[str, int]:
+    """
+    將題庫完整複製到 SQLite 快照檔 (含模型宣告的索引) 並壓縮；
+    先寫入同目錄的暫存檔，完成後才取代 path，不會留下寫到一半的快照
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(suffix=".db", dir=directory)
+    os.close(descriptor)
+
+    counts = {}
+    target_engine = create_engine(f"sqlite:///{temporary}")
+    try:
+        with target_engine.connect() as target:
+            # 暫存檔寫壞了就重來，不需要日誌
+            target.exec_driver_sql("PRAGMA journal_mode=OFF")
+            target.exec_driver_sql("PRAGMA synchronous=OFF")
+
+        with source_engine.connect() as source, target_engine.begin() as target:
+            # 索引在資料寫入後才建立
+            for table in SNAPSHOT_TABLES:
+                target.execute(CreateTable(table))
+
+            for table in SNAPSHOT_TABLES:
+                counts[table.name] = 0
+                result = source.execution_options(yield_per=batch_size).execute(
+                    select(table).order_by(*table.primary_key.columns))
+                for rows in result.partitions():
+                    target.execute(table.insert(), [dict(row._mapping) for row in rows])
+                    counts[table.name] += len(rows)
+                    if progress is not None:
+                        progress(table.name, counts[table.name])
+
+            for table in SNAPSHOT_TABLES:
+                for index in table.indexes:
+                    index.create(target)
+
+        with target_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as target:
+            target.exec_driver_sql("ANALYZE")
+            target.exec_driver_sql("VACUUM")
+    except BaseException:
+        target_engine.dispose()
+        os.remove(temporary)
+        raise
+
+    target_engine.dispose()
+    # mkstemp 建立的檔案只有擁有者可讀
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+    return counts
@@ -22,5 +22,7 @@ import line_bot.views
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("line-bot/", line_bot.views.callback)
+    path("line-bot/", line_bot.views.async_callback if line_bot.views.webhook_mode == "async" else line_bot.views.callback),
+    path("metrics/", line_bot.views.metrics),
+    path("ready/", line_bot.views.ready)
 ]